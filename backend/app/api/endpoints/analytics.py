@@ -5,32 +5,30 @@ Endpoints de Análisis Avanzado (Objetivos 2, 3 y 4)
 - Recomendaciones contextualizadas
 - Explicabilidad (XAI)
 """
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
+from typing import Dict, List, Optional, Union
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from datetime import datetime, timedelta
 import random
+import numpy as np
 
 from app.db.session import get_async_session
 from app.models.campus import Campus, Infrastructure, ConsumptionRecord
 from app.models.user import User
 from app.api.deps import get_current_active_user
+from app.api import series_format
 from app.services.anomaly_service import anomaly_service
-from app.services.xai_service import xai_service
 from app.services.prediction_service import prediction_service
 from app.services.gemini_service import gemini_service
+from app.services.calendar_index import SEDE_NAMES, campus_code_for
+from app.services.historical_data_service import ANOMALY_LABELS, HistoricalDataGenerator
 
 router = APIRouter(tags=["Advanced Analytics"])
 
 # Helper para mapear nombres de campus a códigos del modelo
 def get_campus_code(campus_name: str, city: str = "") -> str:
-    name_map = {"tunja": "tun", "duitama": "dui", "sogamoso": "sog", "chiquinquira": "chi"}
-    search_text = (campus_name + " " + (city or "")).lower()
-    for name, code in name_map.items():
-        if name in search_text:
-            return code
-    return "tun" # Default fallback
+    return campus_code_for(campus_name, city) or "tun" # Default fallback
 
 async def get_model_consistent_data(campus_id: int, days: int, db: AsyncSession) -> List[dict]:
     """
@@ -45,7 +43,7 @@ async def get_model_consistent_data(campus_id: int, days: int, db: AsyncSession)
     
     # Pedir inferencia al modelo para los últimos 'days' días
     start_date = datetime.now() - timedelta(days=days)
-    forecast = prediction_service.predict_campus_consumption(campus_code, days=days, start_date=start_date)
+    forecast = await prediction_service.apredict_campus_consumption(campus_code, days=days, start_date=start_date)
     
     data = []
     if forecast:
@@ -80,15 +78,18 @@ async def analyze_campus_sectors(
     
     campus_code = get_campus_code(campus.name, campus.location_city)
 
+    # Usar XGBoost para predecir el consumo ideal basado en las features del edificio
+    # (una sola inferencia por modelo para todas las unidades)
+    impacts = await prediction_service.apredict_resource_impact_batch(campus_code, [
+        {
+            "area_m2": unit.area_sqm or 1000,
+            "num_estudiantes": campus.population_students // len(infrastructure) if infrastructure else 100
+        }
+        for unit in infrastructure
+    ])
+
     sectors_data = []
-    for unit in infrastructure:
-        # Usar XGBoost para predecir el consumo ideal basado en las features del edificio
-        impact = prediction_service.predict_resource_impact(
-            campus_code, 
-            area_m2=unit.area_sqm or 1000, 
-            num_estudiantes=campus.population_students // len(infrastructure) if infrastructure else 100
-        )
-        
+    for unit, impact in zip(infrastructure, impacts):
         # El modelo nos da la base científica
         expected_consumption = impact.get('energy_prediction', 100)
         
@@ -160,24 +161,18 @@ async def get_peak_hours(
     campus = result.scalar_one_or_none()
     if not campus: raise HTTPException(status_code=404, detail="Campus no encontrado")
 
-    # Usar datos coherentes
-    hourly_data = await get_model_consistent_data(campus_id, days, db) # Simplificado a diario por ahora
-    
-    # Para peak hours necesitamos granularidad horaria real.
-    # Expandimos los datos diarios a horarios usando perfiles típicos pero escalados al valor del modelo
-    expanded_data = []
-    for day_rec in hourly_data:
-        base_val = day_rec['value'] / 24
-        # Perfil simple de curva de campana
-        for h in range(24):
-            factor = 1.0 + (0.5 if 8 <= h <= 18 else -0.5)
-            expanded_data.append({
-                "timestamp": day_rec['timestamp'], # Debería ajustar hora
-                "hour": h,
-                "value": base_val * factor
-            })
-
-    peak_analysis = anomaly_service.identify_peak_hours(expanded_data)
+    # Pronóstico horario real (días × 24): nivel diario de Prophet × forma horaria de XGBoost
+    campus_code = get_campus_code(campus.name, campus.location_city)
+    hourly = await prediction_service.apredict_hourly_consumption(
+        campus_code,
+        days=days,
+        start_date=datetime.now() - timedelta(days=days),
+        inputs={"num_estudiantes": campus.population_students or 5000, "area_m2": campus.total_area_sqm or 15000}
+    )
+    if hourly:
+        peak_analysis = anomaly_service.identify_peak_hours_from_arrays(hourly["hours"], hourly["values"])
+    else:
+        peak_analysis = anomaly_service.identify_peak_hours([])
 
     return {
         "campus_id": campus_id,
@@ -204,9 +199,12 @@ async def get_full_campus_analysis(
     infrastructure = infra_result.scalars().all()
     campus_code = get_campus_code(campus.name, campus.location_city)
 
+    impacts = await prediction_service.apredict_resource_impact_batch(
+        campus_code, [{"area_m2": unit.area_sqm or 100} for unit in infrastructure]
+    )
+
     sectors_data = []
-    for unit in infrastructure:
-        impact = prediction_service.predict_resource_impact(campus_code, area_m2=unit.area_sqm or 100)
+    for unit, impact in zip(infrastructure, impacts):
         expected = impact.get('energy_prediction', 100) / 10
         sectors_data.append({
             "name": unit.name,
@@ -216,12 +214,22 @@ async def get_full_campus_analysis(
         })
 
     consumption_history = await get_model_consistent_data(campus_id, 30, db)
-    
+    hourly = await prediction_service.apredict_hourly_consumption(
+        campus_code,
+        days=30,
+        start_date=datetime.now() - timedelta(days=30),
+        inputs={"num_estudiantes": campus.population_students or 5000, "area_m2": campus.total_area_sqm or 15000}
+    )
+    hourly_data = [
+        {"timestamp": ts, "hour": h, "consumption": v}
+        for ts, h, v in zip(hourly["timestamps"], hourly["hours"], hourly["values"])
+    ] if hourly else []
+
     return anomaly_service.generate_full_analysis(
         campus_name=campus.name,
         sectors_data=sectors_data,
         consumption_history=consumption_history,
-        hourly_data=consumption_history # Simplificación por ahora
+        hourly_data=hourly_data
     )
 
 
@@ -240,8 +248,8 @@ async def explain_prediction(
 
     campus_code = get_campus_code(campus.name, campus.location_city)
 
-    features_df = prediction_service.build_xgb_features(
-        campus_code=campus_code,
+    explained = await prediction_service.aexplain_energy_prediction(
+        campus_code,
         hora=datetime.now().hour,
         num_estudiantes=campus.population_students or 5000,
         num_edificios=10,
@@ -250,20 +258,12 @@ async def explain_prediction(
         lag_1h=100.0,
         lag_24h=2400.0
     )
-
-    xgb_model = prediction_service.models.get("xgb_energia")
-    if not xgb_model:
+    if not explained:
         raise HTTPException(status_code=503, detail="Modelo XGBoost no disponible")
 
-    # Predicción real
-    prediction = float(xgb_model.predict(features_df)[0])
-
-    # Explicación real
-    explanation = xai_service.explain_prediction_shap(
-        model=xgb_model,
-        features_df=features_df,
-        prediction_value=prediction
-    )
+    # Predicción y explicación reales (SHAP en el pool de inferencia)
+    prediction = explained["prediction"]
+    explanation = explained["explanation"]
 
     return {
         "campus_id": campus_id,
@@ -383,7 +383,7 @@ async def chat_with_data(
         
         # A) PREDICCIÓN FUTURA (PROPHET)
         try:
-            f_cast = prediction_service.predict_campus_consumption(campus_code, days=3, start_date=datetime.now())
+            f_cast = await prediction_service.apredict_campus_consumption(campus_code, days=3, start_date=datetime.now())
             if f_cast:
                 context["prediccion_futura_3_dias"] = [f"{f_cast['dates'][i]}: {f_cast['predictions'][i]} kWh" for i in range(len(f_cast['dates']))]
         except Exception as e:
@@ -417,28 +417,44 @@ async def chat_with_data(
         muestreo_horario = {}
 
         # LLAMADA A LOS MODELOS DE MIGUEL
-        for unit in units_to_process:
-            try:
-                # Consumo en hora pico (12h) para el resumen general
-                impact_pico = prediction_service.predict_resource_impact(campus_code, area_m2=unit["area"], hora=12)
-                val_pico = impact_pico.get("energy_prediction", 0)
-                
-                u_type = unit["type"]
-                if u_type not in aggregated_sectors: 
-                    aggregated_sectors[u_type] = {"total_kWh_pico": 0, "n_unidades": 0}
-                
-                aggregated_sectors[u_type]["total_kWh_pico"] += round(val_pico, 2)
-                aggregated_sectors[u_type]["n_unidades"] += 1
-                sectors_summary.append({"name": unit["name"], "kwh_pico": round(val_pico, 1)})
-
-                # SI PIDE CURVA, procesamos puntos temporales específicos via XGBoost
-                if pedir_curva and (u_type.lower() in msg_low or "comedor" in msg_low):
-                    if u_type not in muestreo_horario:
-                        muestreo_horario[u_type] = {}
-                        for h in [2, 12, 22]: # Valle, Pico, Noche
-                            h_impact = prediction_service.predict_resource_impact(campus_code, area_m2=unit["area"], hora=h)
-                            muestreo_horario[u_type][f"{h}:00h"] = f"{round(h_impact.get('energy_prediction', 0), 2)} kWh"
+        # Consumo en hora pico (12h) para el resumen general: lectura de la tabla precalculada de la sede
+        try:
+            impacts_pico = await prediction_service.apredict_resource_impact_grid(
+                campus_code, [{"area_m2": unit["area"], "hora": 12} for unit in units_to_process]
+            )
+        except Exception as e:
+            logger.error(f"Error en analítica de sector: {e}")
+            impacts_pico = [{} for _ in units_to_process]
+
+        curve_hours = [2, 12, 22] # Valle, Pico, Noche
+        curve_units = []
+        for unit, impact_pico in zip(units_to_process, impacts_pico):
+            val_pico = impact_pico.get("energy_prediction", 0)
 
+            u_type = unit["type"]
+            if u_type not in aggregated_sectors: 
+                aggregated_sectors[u_type] = {"total_kWh_pico": 0, "n_unidades": 0}
+
+            aggregated_sectors[u_type]["total_kWh_pico"] += round(val_pico, 2)
+            aggregated_sectors[u_type]["n_unidades"] += 1
+            sectors_summary.append({"name": unit["name"], "kwh_pico": round(val_pico, 1)})
+
+            # SI PIDE CURVA, procesamos puntos temporales específicos via XGBoost
+            if pedir_curva and (u_type.lower() in msg_low or "comedor" in msg_low):
+                if u_type not in muestreo_horario:
+                    muestreo_horario[u_type] = {}
+                    curve_units.append(unit)
+
+        if curve_units:
+            try:
+                curve_impacts = await prediction_service.apredict_resource_impact_grid(
+                    campus_code,
+                    [{"area_m2": unit["area"], "hora": h} for unit in curve_units for h in curve_hours]
+                )
+                for i, unit in enumerate(curve_units):
+                    for j, h in enumerate(curve_hours):
+                        h_impact = curve_impacts[i * len(curve_hours) + j]
+                        muestreo_horario[unit["type"]][f"{h}:00h"] = f"{round(h_impact.get('energy_prediction', 0), 2)} kWh"
             except Exception as e:
                 logger.error(f"Error en analítica de sector: {e}")
 
@@ -453,6 +469,146 @@ async def chat_with_data(
     return response
 
 # Endpoints históricos/globales simplificados para usar la misma lógica...
+class ScenarioRange(BaseModel):
+    start: float
+    stop: float
+    step: float
+
+class ScenarioRequest(BaseModel):
+    # Eje -> lista de valores o rango {start, stop, step} (stop incluido)
+    axes: Dict[str, Union[List[float], ScenarioRange]]
+    fixed: Dict[str, float] = {}
+
+@router.post("/campuses/{campus_id}/scenarios")
+async def sweep_scenarios(
+    campus_id: int,
+    request: ScenarioRequest,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_session)
+):
+    """
+    Barrido what-if sobre los modelos XGBoost: superficies de respuesta para el
+    producto cartesiano de los ejes (p. ej. temperatura × estudiantes × hora).
+    """
+    result = await db.execute(select(Campus).where(Campus.id == campus_id))
+    campus = result.scalar_one_or_none()
+    if not campus: raise HTTPException(status_code=404, detail="Campus no encontrado")
+
+    axes = {}
+    for name, spec in request.axes.items():
+        if isinstance(spec, ScenarioRange):
+            if spec.step <= 0 or spec.stop < spec.start:
+                raise HTTPException(status_code=422, detail=f"Rango inválido para {name}")
+            count = int(np.floor((spec.stop - spec.start) / spec.step + 1e-9)) + 1
+            if count > prediction_service.SCENARIO_MAX_POINTS:
+                raise HTTPException(status_code=422, detail=f"Demasiados valores para {name}")
+            spec = (spec.start + spec.step * np.arange(count)).tolist()
+        axes[name] = spec
+
+    # Valores del campus por defecto para lo que no se barre ni se fija
+    fixed = {
+        "num_estudiantes": campus.population_students or 5000,
+        "area_m2": campus.total_area_sqm or 15000,
+        **request.fixed,
+    }
+    fixed = {k: v for k, v in fixed.items() if k not in axes}
+
+    campus_code = get_campus_code(campus.name, campus.location_city)
+    try:
+        sweep = await prediction_service.apredict_scenario_sweep(campus_code, axes, fixed)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    if not sweep["surfaces"]:
+        raise HTTPException(status_code=503, detail="Modelos XGBoost no disponibles")
+
+    return {
+        "campus_id": campus_id,
+        "campus_name": campus.name,
+        **sweep,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+@router.get("/campuses/{campus_id}/historical")
+async def get_historical_data(
+    campus_id: int,
+    days: int = Query(default=30, ge=1, le=3650),
+    hourly: bool = False,
+    accept: Optional[str] = Header(default=None),
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_session)
+):
+    """
+    Histórico simulado de la sede para los últimos `days` días (diario u horario).
+    Con `Accept: application/vnd.ecco.columnar+json` (o la variante float32 /
+    Arrow, ver app.api.series_format) se envía en columnas con inicio y paso.
+    """
+    media_type = series_format.negotiate(accept)
+    result = await db.execute(select(Campus).where(Campus.id == campus_id))
+    campus = result.scalar_one_or_none()
+    if not campus: raise HTTPException(status_code=404, detail="Campus no encontrado")
+
+    campus_code = get_campus_code(campus.name, campus.location_city)
+    campus_name = SEDE_NAMES[campus_code]
+    start_date = datetime.now() - timedelta(days=days - 1)
+    # Semilla por sede y flujo por mes: un día da el mismo valor en cualquier ventana
+    columns = HistoricalDataGenerator(campus_name).generate_period_arrays(
+        start_date, days, daily=not hourly, seed=campus_id
+    )
+    values = columns["consumption_kwh"]
+    meta = {
+        "campus_id": campus_id,
+        "campus": campus_name,
+        "period": f"{start_date.strftime('%Y-%m-%d')} a {datetime.now().strftime('%Y-%m-%d')}",
+        "stats": {
+            "total_kwh": round(float(values.sum()), 2),
+            "avg_kwh": round(float(values.mean()), 2),
+            "max_kwh": round(float(values.max()), 2),
+            "min_kwh": round(float(values.min()), 2),
+        },
+    }
+
+    if media_type != series_format.JSON:
+        series = {"kwh": values}
+        if not hourly:
+            series.update(temperature_c=columns["temperature_c"], anomaly=columns["anomaly"])
+        return series_format.series_response(
+            media_type, np.datetime64(start_date.date()), 3600 if hourly else 86400, series, meta
+        )
+
+    if hourly:
+        data = [
+            {"timestamp": timestamp, "hour": hour, "consumption_kwh": round(value, 2)}
+            for timestamp, hour, value in zip(
+                np.datetime_as_string(columns["timestamp"], unit="s").tolist(),
+                columns["hour"].tolist(),
+                values.tolist(),
+            )
+        ]
+    else:
+        data = [
+            {
+                "date": date,
+                "consumption_kwh": round(value, 2),
+                "temperature_c": round(temp, 1),
+                "is_weekend": weekend,
+                "is_holiday": holiday,
+                "is_academic": academic,
+                "anomaly": ANOMALY_LABELS[anomaly],
+            }
+            for date, value, temp, weekend, holiday, academic, anomaly in zip(
+                np.datetime_as_string(columns["date"]).tolist(),
+                values.tolist(),
+                columns["temperature_c"].tolist(),
+                columns["is_weekend"].tolist(),
+                columns["is_holiday"].tolist(),
+                columns["is_academic"].tolist(),
+                columns["anomaly"].tolist(),
+            )
+        ]
+    return {**meta, "data": data}
+
+
 @router.get("/global/summary")
 async def get_global_analytics_summary(
     current_user: User = Depends(get_current_active_user),
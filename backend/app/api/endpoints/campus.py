@@ -1,16 +1,23 @@
-from typing import List, Optional, Any
-from fastapi import APIRouter, Depends, HTTPException, status
+import json
+from datetime import date, datetime
+from typing import Annotated, List, Optional, Any
+import numpy as np
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from pydantic import Field
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete, func
 from app.db.session import get_async_session
 from app.models.campus import Campus, Infrastructure, ConsumptionRecord
 from app.models.user import User
 from app.api.deps import get_current_active_user
+from app.api import series_format
 from app.schemas.campus import (
     Campus as CampusSchema, CampusCreate,
     Infrastructure as InfrastructureSchema, InfrastructureCreate,
     ConsumptionRecord as ConsumptionSchema, ConsumptionRecordCreate
 )
+from app.services.calendar_index import campus_code_for
 from app.services.gemini_service import gemini_service
 from app.services.prediction_service import prediction_service
 
@@ -179,16 +186,26 @@ async def analyze_campus(
 
 # --- PREDICTIONS & ML ---
 
+def campus_model_code(campus: Campus) -> str:
+    """Código de sede de los modelos a partir del nombre o la ciudad (tun por defecto)."""
+    return campus_code_for(campus.name, campus.location_city) or "tun"
+
 @router.get("/campuses/{campus_id}/predictions")
 async def get_campus_predictions(
     campus_id: int,
     days: int = 7,
+    quantiles: Optional[List[Annotated[float, Field(ge=0, le=1)]]] = Query(default=None),
+    accept: Optional[str] = Header(default=None),
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_async_session)
 ):
     """
     Combina modelos Prophet de Miguel con Gemini para ofrecer proyecciones inteligentes.
+    `quantiles` (repetible, p. ej. ?quantiles=0.1&quantiles=0.9) añade bandas a medida.
+    El pronóstico también se sirve en columnas (inicio + paso) según `Accept`,
+    ver app.api.series_format.
     """
+    media_type = series_format.negotiate(accept)
     # 1. Verificar existencia y obtener nombre para mapear modelo (Demo mode)
     result = await db.execute(select(Campus).where(Campus.id == campus_id))
     campus = result.scalar_one_or_none()
@@ -196,36 +213,75 @@ async def get_campus_predictions(
         raise HTTPException(status_code=404, detail="Sede no encontrada")
 
     # 2. Mapear nombre de sede a código de modelo
-    name_map = {
-        "tunja": "tun",
-        "duitama": "dui",
-        "sogamoso": "sog",
-        "chiquinquira": "chi"
-    }
-    
-    # Intenta encontrar el código en el nombre o ciudad
-    campus_code = "tun" # Default fallback
-    found = False
-    search_text = (campus.name + " " + (campus.location_city or "")).lower()
-    
-    for name, code in name_map.items():
-        if name in search_text:
-            campus_code = code
-            found = True
-            break
-    
+    campus_code = campus_model_code(campus)
+
     # 3. Obtener predicción de ML
-    ml_forecast = prediction_service.predict_campus_consumption(campus_code, days=days)
+    ml_forecast = await prediction_service.apredict_campus_consumption(campus_code, days=days, quantiles=quantiles)
     
     if not ml_forecast:
         return {"error": f"No hay modelos de ML disponibles para la sede {campus.name}"}
 
     # 4. Obtener Insight de Gemini basado en la predicción
     ai_insight = await gemini_service.get_prediction_insights(ml_forecast, campus.name)
-    
+
+    if media_type != series_format.JSON and ml_forecast["dates"]:
+        series = {key: ml_forecast[key] for key in ("predictions", "lower_bound", "upper_bound", "trend")}
+        series.update({f"q{q}": level for q, level in ml_forecast.get("quantiles", {}).items()})
+        meta = {"campus_id": campus_id, "campus_name": campus.name, "ai_analysis": ai_insight}
+        return series_format.series_response(media_type, np.datetime64(ml_forecast["dates"][0]), 86400, series, meta)
+
     return {
         "campus_id": campus_id,
         "campus_name": campus.name,
         "forecast": ml_forecast,
         "ai_analysis": ai_insight
     }
+
+@router.get("/campuses/{campus_id}/predictions/stream")
+async def stream_campus_predictions(
+    campus_id: int,
+    days: int = Query(default=365, ge=1, le=3650),
+    chunk_days: int = Query(default=30, ge=1, le=366),
+    fmt: str = Query(default="ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    start_date: Optional[date] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_session)
+):
+    """
+    Exporta el pronóstico diario de Prophet en streaming (NDJSON o CSV), una fila
+    por día, calculado por tramos de `chunk_days`: el primer tramo llega enseguida
+    y la memoria no depende del horizonte.
+    """
+    result = await db.execute(select(Campus).where(Campus.id == campus_id))
+    campus = result.scalar_one_or_none()
+    if not campus:
+        raise HTTPException(status_code=404, detail="Sede no encontrada")
+
+    campus_code = campus_model_code(campus)
+    start = datetime.combine(start_date, datetime.min.time()) if start_date else None
+    chunks = prediction_service.astream_campus_consumption(campus_code, days, start_date=start, chunk_days=chunk_days)
+    # El primer tramo se pide antes de responder: sin modelo no se envía un 200 vacío
+    first = await anext(chunks, None)
+    if first is None:
+        raise HTTPException(status_code=503, detail="Modelo Prophet no disponible")
+    columns = ("date", "prediction", "lower_bound", "upper_bound", "trend")
+
+    async def all_chunks():
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    async def rows():
+        if fmt == "csv":
+            yield "campus_code," + ",".join(columns) + "\n"
+        async for chunk in all_chunks():
+            lines = []
+            for values in zip(chunk["dates"], chunk["predictions"], chunk["lower_bound"], chunk["upper_bound"], chunk["trend"]):
+                if fmt == "csv":
+                    lines.append(f"{campus_code}," + ",".join(str(v) for v in values) + "\n")
+                else:
+                    lines.append(json.dumps({"campus_code": campus_code, **dict(zip(columns, values))}) + "\n")
+            yield "".join(lines)
+
+    media_type = "text/csv" if fmt == "csv" else "application/x-ndjson"
+    return StreamingResponse(rows(), media_type=media_type)
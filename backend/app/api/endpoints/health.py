@@ -1,22 +1,32 @@
 """Healthcheck endpoint."""
+import asyncio
 from datetime import datetime, timezone
+from typing import Any, Dict
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Response, status
 from sqlalchemy import text
 
+from app.api.deps import get_current_active_user
 from app.db.session import get_async_engine
-from app.schemas.health import DatabaseStatus, HealthResponse
+from app.models.user import User
+from app.schemas.health import DatabaseStatus, HealthResponse, ModelsStatus
+from app.services.inference_executor import inference_executor
+from app.services.prediction_service import prediction_service
 
 router = APIRouter()
 
 
 @router.get("/", response_model=HealthResponse, summary="Service healthcheck")
-async def get_health() -> HealthResponse:
+async def get_health(response: Response) -> HealthResponse:
     """Return service status and metadata including database connection.
 
     This uses the exported `engine` from `app.db.session` and executes a simple
     SELECT 1 using SQLAlchemy's `text` construct. Using `engine.begin()` and
     `await conn.execute(text(...))` is the correct async API for SQLAlchemy.
+
+    While the startup model warm-up is running the endpoint answers 503 with
+    status "starting", and 503 "degraded" if the warm-up failed, so load
+    balancers only route traffic to workers whose models are loaded.
     """
     db_status = None
 
@@ -37,8 +47,51 @@ async def get_health() -> HealthResponse:
     except Exception:
         db_status = DatabaseStatus(connected=False)
 
+    models_status = ModelsStatus(state=prediction_service.readiness_state, models=prediction_service.model_status)
+    models_ok = models_status.state != "failed" and all(v == "loaded" for v in models_status.models.values())
+
+    if models_status.state == "warming":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        overall = "starting"
+    elif models_status.state == "failed":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+        overall = "degraded"
+    else:
+        overall = "ok" if db_status.connected and models_ok else "degraded"
+
     return HealthResponse(
-        status="ok" if db_status.connected else "degraded",
+        status=overall,
         timestamp=datetime.now(timezone.utc),
         database=db_status,
+        models=models_status,
     )
+
+
+@router.get("/metrics", summary="Inference and cache counters")
+async def get_metrics() -> Dict[str, Any]:
+    """Expose scrapeable counters for the forecast cache and inference queue.
+
+    Values are local to this process (each uvicorn worker reports its own).
+    """
+    return {
+        "forecast_cache": prediction_service.cache_stats(),
+        "inference": inference_executor.stats(),
+    }
+
+
+@router.post("/models/reload", summary="Hot-reload changed model artifacts")
+async def reload_models(current_user: User = Depends(get_current_active_user)) -> Dict[str, Any]:
+    """Pick up new files in ml_models/ without a restart.
+
+    Changed artifacts are loaded and smoke-tested in the background and
+    swapped in atomically; a failing artifact keeps the previous version.
+    The inference pool is then replaced by fresh workers that load the
+    current files, while the old workers finish their in-flight requests.
+    """
+    models = await asyncio.to_thread(prediction_service.reload_models)
+    workers_recycled = await inference_executor.reload()
+    return {
+        "models": models,
+        "versions": dict(prediction_service.model_versions),
+        "workers_recycled": workers_recycled,
+    }
@@ -0,0 +1,116 @@
+"""Compact wire formats for regularly spaced time series, negotiated by `Accept`.
+
+A series is sent as an epoch start plus a fixed step instead of one date
+string per point, with one array per column instead of one object per row:
+
+- ``application/vnd.ecco.columnar+json``: columns as JSON number arrays.
+- ``application/vnd.ecco.columnar-f32+json``: same envelope, each column as
+  base64 of little-endian float32 values.
+- ``application/vnd.apache.arrow.stream``: Arrow IPC stream with a
+  ``timestamp`` column (only offered when pyarrow is installed).
+
+Anything else (including a missing header or ``*/*``) keeps the endpoint's
+regular JSON response.
+"""
+import base64
+import json
+from typing import Any, Dict, Optional
+
+import numpy as np
+from fastapi import HTTPException, Response
+from fastapi.responses import JSONResponse
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.ecco.columnar+json"
+COLUMNAR_F32 = "application/vnd.ecco.columnar-f32+json"
+ARROW_STREAM = "application/vnd.apache.arrow.stream"
+
+
+def _arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+def negotiate(accept: Optional[str]) -> str:
+    """Pick the preferred supported media type from an Accept header (q-values honoured)."""
+    if not accept:
+        return JSON
+    supported = [JSON, COLUMNAR_JSON, COLUMNAR_F32] + ([ARROW_STREAM] if _arrow_available() else [])
+    best, best_q = None, 0.0
+    for part in accept.split(","):
+        media_type, *params = [piece.strip() for piece in part.split(";")]
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        media_type = media_type.lower()
+        if media_type in ("*/*", "application/*"):
+            media_type = JSON
+        if media_type in supported and q > best_q:
+            best, best_q = media_type, q
+    if best is None:
+        raise HTTPException(status_code=406, detail=f"Formatos disponibles: {', '.join(supported)}")
+    return best
+
+
+def series_response(
+    media_type: str,
+    start: np.datetime64,
+    step_seconds: int,
+    columns: Dict[str, Any],
+    meta: Optional[Dict[str, Any]] = None,
+    decimals: int = 2
+) -> Response:
+    """
+    Encode equally spaced columns in one of the compact formats.
+    `meta` carries the endpoint's scalar fields (ids, names, stats...).
+    """
+    start_epoch = int(np.datetime64(start, "s").astype(np.int64))
+    arrays = {name: np.asarray(values) for name, values in columns.items()}
+    length = len(next(iter(arrays.values()))) if arrays else 0
+
+    if media_type == ARROW_STREAM:
+        return Response(_arrow_stream(start_epoch, step_seconds, arrays, meta or {}), media_type=ARROW_STREAM)
+
+    envelope: Dict[str, Any] = {
+        **(meta or {}),
+        "start": str(np.datetime64(start_epoch, "s")),
+        "start_epoch": start_epoch,
+        "step_seconds": step_seconds,
+        "length": length,
+    }
+    if media_type == COLUMNAR_F32:
+        envelope["dtype"] = "<f4"
+        envelope["columns"] = {
+            name: base64.b64encode(values.astype("<f4").tobytes()).decode("ascii")
+            for name, values in arrays.items()
+        }
+    else:
+        envelope["columns"] = {
+            name: (np.round(values, decimals) if values.dtype.kind == "f" else values).tolist()
+            for name, values in arrays.items()
+        }
+    return JSONResponse(envelope, media_type=media_type)
+
+
+def _arrow_stream(start_epoch: int, step_seconds: int, arrays: Dict[str, np.ndarray], meta: Dict[str, Any]) -> bytes:
+    import pyarrow as pa
+
+    length = len(next(iter(arrays.values()))) if arrays else 0
+    timestamps = np.datetime64(start_epoch, "s") + np.arange(length) * np.timedelta64(step_seconds, "s")
+    table = pa.table(
+        {"timestamp": timestamps, **{name: values.astype(np.float32) if values.dtype.kind == "f" else values
+                                     for name, values in arrays.items()}},
+        metadata={"meta": json.dumps(meta, default=str)},
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
@@ -0,0 +1,404 @@
+"""Bounded caches with LRU eviction, TTL expiry and counters.
+
+Two interchangeable backends are provided:
+
+* `LRUTTLCache`: in-process memory, fastest, private to each worker.
+* `SQLiteCache`: on-disk SQLite file (WAL mode) shared by every worker
+  process on the host, so one computation serves all of them.
+
+Use `build_cache()` to pick one from settings. `SingleFlight` complements
+them: concurrent misses for the same key share one computation.
+"""
+from __future__ import annotations
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+def _register_after_fork(method: Callable[[], None]) -> None:
+    """Call `method` in the child after os.fork() while its owner is still alive.
+
+    Locks held by other threads and background threads themselves do not
+    survive a fork (e.g. gunicorn --preload), so objects built in the master
+    must rebuild them in each worker.
+    """
+    if hasattr(os, "register_at_fork"):
+        ref = weakref.WeakMethod(method)
+
+        def _after_fork() -> None:
+            bound = ref()
+            if bound is not None:
+                bound()
+
+        os.register_at_fork(after_in_child=_after_fork)
+
+
+class LRUTTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl_seconds`.
+
+    Size is bounded by `max_entries` and, optionally, by `max_bytes` (measured
+    as the pickled size of each value). Expired entries are dropped on lookup
+    and by a background sweeper thread started with `start_sweeper()`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600.0,
+        max_bytes: Optional[int] = None,
+        sweep_interval_seconds: float = 60.0,
+    ) -> None:
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes or None
+        self.sweep_interval_seconds = sweep_interval_seconds
+
+        # key -> (value, expires_at, size_bytes)
+        self._data: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        _register_after_fork(self._after_fork_in_child)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry[1] > time.monotonic()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value (refreshing its LRU position) or `default`."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            if entry[1] <= time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._data.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        """Store `value`, evicting least-recently-used entries to respect the bounds."""
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            return  # Nunca cabría: no desalojar todo el caché por un solo valor
+        expires_at = time.monotonic() + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            self._data[key] = (value, expires_at, size)
+            self._bytes += size
+            while len(self._data) > self.max_entries or (self.max_bytes and self._bytes > self.max_bytes):
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self._evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def sweep(self) -> int:
+        """Remove every expired entry. Returns how many were dropped."""
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, expires_at, _) in self._data.items() if expires_at <= now]
+            for key in expired:
+                self._remove(key)
+            self._expirations += len(expired)
+        return len(expired)
+
+    def start_sweeper(self) -> None:
+        """Start the background daemon thread that periodically calls `sweep()`."""
+        with self._lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._stop.clear()
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="cache-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters suitable for scraping (see /api/v1/health/metrics)."""
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "backend": "memory",
+                "entries": len(self._data),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes if self.max_bytes else None,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+    def _remove(self, key: Hashable) -> None:
+        _, _, size = self._data.pop(key)
+        self._bytes -= size
+
+    def _sweep_loop(self) -> None:
+        while not self._stop.wait(self.sweep_interval_seconds):
+            self.sweep()
+
+    def _after_fork_in_child(self) -> None:
+        restart = self._sweeper is not None and not self._stop.is_set()
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._sweeper = None
+        if restart:
+            self.start_sweeper()
+
+
+class SQLiteCache:
+    """Cross-process LRU+TTL cache stored in a SQLite file.
+
+    Exposes the same interface as `LRUTTLCache`. Keys must be strings and
+    values picklable. Hit/miss/eviction counters are local to the process;
+    `entries`/`bytes` reflect the shared store.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int = 512,
+        ttl_seconds: float = 3600.0,
+        max_bytes: Optional[int] = None,
+        sweep_interval_seconds: float = 60.0,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes or None
+        self.sweep_interval_seconds = sweep_interval_seconds
+
+        self._lock = threading.Lock()
+        self._conn = self._connect()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        _register_after_fork(self._after_fork_in_child)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.path), timeout=10, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL,"
+            " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_last_access ON cache (last_access)")
+        return conn
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM cache WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+        return row is not None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._misses += 1
+                return default
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._conn.execute("UPDATE cache SET last_access = ? WHERE key = ?", (now, key))
+            self._hits += 1
+        return pickle.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.max_bytes and len(blob) > self.max_bytes:
+            return
+        now = time.time()
+        expires_at = now + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, size, expires_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                    (key, blob, len(blob), expires_at, now),
+                )
+                self._evict_locked()
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache")
+
+    def sweep(self) -> int:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            self._expirations += cursor.rowcount
+        return cursor.rowcount
+
+    def start_sweeper(self) -> None:
+        with self._lock:
+            if self._sweeper is not None and self._sweeper.is_alive():
+                return
+            self._stop.clear()
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="cache-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def stop_sweeper(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+            lookups = self._hits + self._misses
+            return {
+                "backend": "sqlite",
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "bytes": total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_ratio": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
+
+    def _evict_locked(self) -> None:
+        entries, total_bytes = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+        while entries > self.max_entries or (self.max_bytes and total_bytes > self.max_bytes):
+            key, size = self._conn.execute("SELECT key, size FROM cache ORDER BY last_access LIMIT 1").fetchone()
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._evictions += 1
+            entries -= 1
+            total_bytes -= size
+
+    def _sweep_loop(self) -> None:
+        while not self._stop.wait(self.sweep_interval_seconds):
+            try:
+                self.sweep()
+            except sqlite3.Error:
+                pass  # Another process holds the lock; retry on the next cycle
+
+    def _after_fork_in_child(self) -> None:
+        # A SQLite connection must not be used (or closed) across fork: keep the
+        # inherited one referenced so its finalizer never runs, and open a new one.
+        self._inherited_conn = self._conn
+        self._conn = self._connect()
+        restart = self._sweeper is not None and not self._stop.is_set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper = None
+        if restart:
+            self.start_sweeper()
+
+
+class SingleFlight:
+    """Deduplicate concurrent calls that share a key.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive while it is in flight block and receive the same result (or
+    exception). Nothing is remembered once the call finishes; pair it with a
+    cache so later callers hit the stored value instead.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+        _register_after_fork(self._after_fork_in_child)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                self.leaders += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return call.result()
+
+        try:
+            result = fn()
+        except BaseException as exc:
+            call.set_exception(exc)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"in_flight": len(self._calls), "leaders": self.leaders, "coalesced": self.coalesced}
+
+    def _after_fork_in_child(self) -> None:
+        # Leaders of in-flight calls are threads that no longer exist in the child
+        self._lock = threading.Lock()
+        self._calls = {}
+
+
+def build_cache(
+    backend: str = "memory",
+    path: Optional[str] = None,
+    **kwargs: Any,
+) -> "LRUTTLCache | SQLiteCache":
+    """Create the cache backend named by `backend` ("memory" or "sqlite")."""
+    if backend == "sqlite":
+        return SQLiteCache(path or "cache/forecasts.sqlite3", **kwargs)
+    if backend != "memory":
+        raise ValueError(f"Unknown cache backend: {backend}")
+    return LRUTTLCache(**kwargs)
@@ -1,10 +1,14 @@
 """Application settings and configuration helpers."""
 from functools import lru_cache
+from pathlib import Path
 from typing import List
 
 from pydantic import field_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# backend/ directory: relative data paths resolve here, whatever the working directory
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
 
 class Settings(BaseSettings):
     """Application configuration loaded from environment variables."""
@@ -31,6 +35,40 @@ class Settings(BaseSettings):
     gemini_api_key: str | None = None
     gemini_model_name: str = "gemini-2.5-flash-lite" # Requested by user
 
+    # Precarga y predicción de calentamiento de todos los modelos al arrancar
+    model_warmup_on_startup: bool = True
+
+    # Inferencia ML: pool de procesos dedicado (None = un worker por núcleo, 0 = sin pool)
+    inference_workers: int | None = None
+    # Máximo de inferencias en cola/en curso antes de rechazar con 503
+    inference_queue_size: int = 64
+    # Recarga en caliente: segundos entre revisiones de ml_models/ (0 = solo con POST /health/models/reload)
+    model_watch_interval_seconds: int = 0
+
+    # Caché de pronósticos (LRU + TTL); max_bytes=0 desactiva el límite por tamaño.
+    # backend "sqlite" comparte el caché entre todos los workers del host.
+    # Las rutas relativas se resuelven desde backend/ (como ml_models/).
+    forecast_cache_backend: str = "memory"
+    forecast_cache_path: str = "cache/forecasts.sqlite3"
+    forecast_cache_max_entries: int = 512
+    forecast_cache_max_bytes: int = 0
+    forecast_cache_ttl_minutes: int = 60
+    # Marco diario precalculado por sede (hoy - past .. hoy + future) del que se recortan las ventanas
+    forecast_superset_past_days: int = 365
+    forecast_superset_future_days: int = 365
+    # Prophet rápido: yhat/trend con NumPy a partir de los parámetros ajustados
+    # (sin muestreo de incertidumbre; bandas por cuantiles de residuos)
+    prophet_fast_mode: bool = False
+    prophet_fast_tolerance: float = 1e-6
+    # XGBoost rápido: árboles aplanados en arrays NumPy (fila única / lotes pequeños sin DMatrix)
+    xgb_fast_mode: bool = False
+    xgb_fast_tolerance: float = 1e-5
+    # Hilos por booster XGBoost (vacío = 1 con pool de inferencia; sin pool, núcleos / 3)
+    xgb_nthread: int | None = None
+    # Reentrenamiento de Prophet (scripts/refit_prophet.py): procesos en paralelo y versiones a conservar
+    prophet_refit_workers: int = 4
+    prophet_refit_keep_versions: int = 5
+
     # Support running from root or backend folder
     model_config = SettingsConfigDict(
         env_file=(".env", "backend/.env"),
@@ -46,6 +84,13 @@ class Settings(BaseSettings):
             return [origin.strip() for origin in value.split(",") if origin]
         return value
 
+    @field_validator("forecast_cache_path")
+    @classmethod
+    def resolve_cache_path(cls, value: str) -> str:
+        """Anchor a relative cache path to the backend directory."""
+        path = Path(value)
+        return str(path if path.is_absolute() else BACKEND_DIR / path)
+
 
 @lru_cache
 def get_settings() -> Settings:
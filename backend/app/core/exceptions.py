@@ -18,6 +18,10 @@ class ErrorResponse(BaseModel):
     error_type: str = "error"
 
 
+class ServiceOverloadedError(Exception):
+    """Raised when a bounded work queue (e.g. ML inference) is full."""
+
+
 async def general_exception_handler(request: Request, exc: Exception) -> JSONResponse:
     """Handle all unhandled exceptions."""
     return JSONResponse(
@@ -44,7 +48,22 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
+async def overloaded_exception_handler(request: Request, exc: ServiceOverloadedError) -> JSONResponse:
+    """Handle saturation of bounded queues with a retryable 503."""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=ErrorResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            message="Service overloaded, retry later",
+            error_type="ServiceOverloaded",
+            detail=str(exc),
+        ).model_dump(),
+        headers={"Retry-After": "1"},
+    )
+
+
 def register_exception_handlers(app: FastAPI) -> None:
     """Register all custom exception handlers."""
     app.add_exception_handler(RequestValidationError, validation_exception_handler)
+    app.add_exception_handler(ServiceOverloadedError, overloaded_exception_handler)
     app.add_exception_handler(Exception, general_exception_handler)
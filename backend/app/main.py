@@ -3,7 +3,10 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -20,6 +23,8 @@ from app.api.routes import api_router
 from app.core.config import get_settings
 from app.core.exceptions import register_exception_handlers
 from app.core.logging import setup_logging
+from app.services.inference_executor import inference_executor
+from app.services.prediction_service import prediction_service
 
 logger = logging.getLogger("app")
 
@@ -27,11 +32,51 @@ logger = logging.getLogger("app")
 limiter = None
 
 
+async def warm_up_models() -> None:
+    """Preload and warm-predict every model where inference runs.
+
+    With an inference pool the API process never predicts itself, so only the
+    workers load models (one copy per worker, not an extra one here).
+    """
+    prediction_service.readiness_state = "warming"
+    try:
+        if inference_executor.max_workers > 0:
+            prediction_service.model_status = await inference_executor.warm_up()
+        else:
+            await asyncio.to_thread(prediction_service.warm_up)
+        prediction_service.readiness_state = "ready"
+    except Exception:
+        logger.exception("Model warm-up failed")
+        prediction_service.readiness_state = "failed"
+
+
+@asynccontextmanager
+async def lifespan(application: FastAPI) -> AsyncIterator[None]:
+    """Warm models and start the model watcher on startup; release them on shutdown."""
+    settings = get_settings()
+    warm_up_task = None
+    if settings.model_warmup_on_startup:
+        warm_up_task = asyncio.create_task(warm_up_models())
+    if settings.model_watch_interval_seconds > 0:
+        prediction_service.start_model_watcher(settings.model_watch_interval_seconds)
+    yield
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+    prediction_service.stop_model_watcher()
+    inference_executor.shutdown()
+
+
 def create_app() -> FastAPI:
     settings = get_settings()
     setup_logging()
 
-    application = FastAPI(title=settings.app_name, version=settings.project_version, docs_url="/docs", redoc_url="/redoc")
+    application = FastAPI(
+        title=settings.app_name,
+        version=settings.project_version,
+        docs_url="/docs",
+        redoc_url="/redoc",
+        lifespan=lifespan,
+    )
 
     # Register custom exception handlers
     register_exception_handlers(application)
@@ -1,6 +1,6 @@
 """Response schemas for health endpoints."""
 from datetime import datetime
-from typing import Literal
+from typing import Dict, Literal
 
 from pydantic import BaseModel, ConfigDict
 
@@ -12,12 +12,20 @@ class DatabaseStatus(BaseModel):
     engine: str = "SQLite (Async)"
 
 
+class ModelsStatus(BaseModel):
+    """ML model readiness (warm-up state and per-model load status)."""
+
+    state: Literal["pending", "warming", "ready", "failed"]
+    models: Dict[str, str] = {}
+
+
 class HealthResponse(BaseModel):
     """Healthcheck response payload."""
 
-    status: Literal["ok", "degraded"]
+    status: Literal["ok", "degraded", "starting"]
     timestamp: datetime
     database: DatabaseStatus | None = None
+    models: ModelsStatus | None = None
 
     model_config = ConfigDict(
         json_schema_extra={
@@ -26,6 +34,7 @@ class HealthResponse(BaseModel):
                     "status": "ok",
                     "timestamp": "2023-01-01T00:00:00Z",
                     "database": {"connected": True, "engine": "SQLite (Async)"},
+                    "models": {"state": "ready", "models": {"prophet_tun": "loaded", "xgb_energia": "loaded"}},
                 }
             ]
         }
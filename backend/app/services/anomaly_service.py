@@ -246,24 +246,34 @@ class AnomalyDetectionService:
         if not hourly_data:
             return {"peak_hours": [], "distribution": [], "status": "no_data"}
 
-        # Agrupar por hora
-        hourly_totals = {}
-        for record in hourly_data:
-            hour = record.get("hour", 0)
-            consumption = record.get("consumption", 0)
-            hourly_totals[hour] = hourly_totals.get(hour, 0) + consumption
-
-        # Convertir a lista y calcular estadísticas
+        hours = np.array([record.get("hour", 0) for record in hourly_data], dtype=int)
+        consumption = np.array([record.get("consumption", 0) for record in hourly_data], dtype=float)
+        return self.identify_peak_hours_from_arrays(hours, consumption)
+
+    def identify_peak_hours_from_arrays(
+        self,
+        hours: np.ndarray,
+        consumption: np.ndarray
+    ) -> Dict[str, Any]:
+        """
+        Igual que identify_peak_hours, con las horas (0-23) y los consumos como
+        arrays paralelos (p. ej. el pronóstico horario días × 24 aplanado).
+        """
+        hours = np.asarray(hours, dtype=int)
+        consumption = np.asarray(consumption, dtype=float)
+        if not len(hours):
+            return {"peak_hours": [], "distribution": [], "status": "no_data"}
+
+        # Agrupar por hora en una sola pasada
+        totals = np.bincount(hours, weights=consumption, minlength=24)
+        present = np.flatnonzero(np.bincount(hours, minlength=24))
         distribution = [
-            {"hour": h, "consumption": round(c, 2)} 
-            for h, c in sorted(hourly_totals.items())
+            {"hour": int(h), "consumption": round(float(totals[h]), 2)}
+            for h in present
         ]
-        
-        if not distribution:
-            return {"peak_hours": [], "distribution": [], "status": "no_data"}
 
-        values = [d["consumption"] for d in distribution]
-        mean_consumption = np.mean(values)
+        values = np.array([d["consumption"] for d in distribution])
+        mean_consumption = float(np.mean(values))
         threshold = mean_consumption * 1.3  # 30% sobre el promedio = hora pico
 
         peak_hours = [
@@ -0,0 +1,139 @@
+"""
+Índice de Calendario Precalculado (2015-2035)
+Un array por día con los indicadores que antes se recalculaban en cada llamada
+(fin de semana, festivo, periodo académico por sede) y el mes. Cualquier fecha
+o vector de fechas se resuelve con una indexación O(1) por día; lo comparten el
+generador histórico, el constructor de features de XGBoost y el servicio de
+anomalías.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Rango precalculado (el mismo que la tabla de festivos de la vía rápida de Prophet)
+CALENDAR_RANGE: Tuple[str, str] = ("2015-01-01", "2035-12-31")
+
+# Periodos académicos típicos Colombia
+ACADEMIC_PERIODS = [
+    # Semestre 1: Feb-Jun
+    {"start_month": 2, "start_day": 1, "end_month": 6, "end_day": 15},
+    # Semestre 2: Ago-Dic
+    {"start_month": 8, "start_day": 1, "end_month": 12, "end_day": 10},
+]
+
+# Calendario académico por sede (hoy todas siguen el general)
+SEDE_ACADEMIC_PERIODS: Dict[str, List[Dict[str, int]]] = {
+    "tun": ACADEMIC_PERIODS,
+    "dui": ACADEMIC_PERIODS,
+    "sog": ACADEMIC_PERIODS,
+    "chi": ACADEMIC_PERIODS,
+}
+
+# Nombres de sede usados en el resto del backend -> código (único mapa; lo importan endpoints y servicios)
+SEDE_ALIASES: Dict[str, str] = {"tunja": "tun", "duitama": "dui", "sogamoso": "sog", "chiquinquira": "chi"}
+SEDE_NAMES: Dict[str, str] = {code: name for name, code in SEDE_ALIASES.items()}
+
+
+def campus_code_for(name: str, city: Optional[str] = None) -> Optional[str]:
+    """Código de sede a partir del nombre o la ciudad; None si no corresponde a ninguna."""
+    search_text = f"{name} {city or ''}".lower()
+    for key, code in SEDE_ALIASES.items():
+        if key in search_text:
+            return code
+    return None
+
+# Festivos Colombia (aproximados, varían por año)
+HOLIDAYS_FIXED = [
+    (1, 1),   # Año nuevo
+    (5, 1),   # Día del trabajo
+    (7, 20),  # Independencia
+    (8, 7),   # Batalla Boyacá
+    (12, 25), # Navidad
+]
+
+# Bits de `flags`
+WEEKEND = 1
+HOLIDAY = 2
+_ACADEMIC_SHIFT = 2
+
+
+class CalendarIndex:
+    """Indicadores por día de un rango de fechas, indexados por días desde `day0`."""
+
+    def __init__(self, start: str = CALENDAR_RANGE[0], end: str = CALENDAR_RANGE[1]):
+        self.day0 = np.datetime64(start, "D")
+        days = np.arange(self.day0, np.datetime64(end, "D") + 1)
+        self.sedes = list(SEDE_ACADEMIC_PERIODS)
+
+        months = days.astype("datetime64[M]")
+        month_index = months.astype(np.int64)
+        self.month = (month_index % 12 + 1).astype(np.int8)
+        years = month_index // 12 + 1970
+        month_day = self.month.astype(np.int64) * 100 + (days - months).astype(np.int64) + 1
+
+        flags = np.where((days.astype(np.int64) + 3) % 7 >= 5, WEEKEND, 0)  # 1970-01-01 fue jueves
+        flags |= np.where(np.isin(days, self._holidays(int(years[0]), int(years[-1]))), HOLIDAY, 0)
+        for i, sede in enumerate(self.sedes):
+            academic = np.zeros(len(days), dtype=bool)
+            for period in SEDE_ACADEMIC_PERIODS[sede]:
+                start_md = period["start_month"] * 100 + period["start_day"]
+                end_md = period["end_month"] * 100 + period["end_day"]
+                academic |= (month_day >= start_md) & (month_day <= end_md)
+            flags |= np.where(academic, 1 << (_ACADEMIC_SHIFT + i), 0)
+        self.flags = flags.astype(np.uint8)
+
+    @staticmethod
+    def _holidays(first_year: int, last_year: int) -> np.ndarray:
+        """Festivos fijos de cada año del rango (los mismos con que se entrenaron los modelos)."""
+        dates = [date(year, m, d) for year in range(first_year, last_year + 1) for m, d in HOLIDAYS_FIXED]
+        return np.array(dates, dtype="datetime64[D]")
+
+    def __len__(self) -> int:
+        return len(self.flags)
+
+    def _sede_bit(self, sede: Optional[str]) -> int:
+        code = SEDE_ALIASES.get((sede or "tun").lower(), (sede or "tun").lower())
+        index = self.sedes.index(code) if code in self.sedes else 0
+        return 1 << (_ACADEMIC_SHIFT + index)
+
+    def day_index(self, dates: Any) -> np.ndarray:
+        """Posición de cada fecha en el índice (fechas, datetimes o datetime64 de cualquier unidad)."""
+        return np.asarray(dates, dtype="datetime64[D]").astype(np.int64) - self.day0.astype(np.int64)
+
+    def covers(self, dates: Any) -> bool:
+        index = self.day_index(dates)
+        return index.size == 0 or (index.min() >= 0 and index.max() < len(self))
+
+    def lookup(self, dates: Any, sede: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """
+        Indicadores para un vector de fechas: weekday (0 = lunes), month,
+        is_weekend, is_holiday e is_academic (de la sede indicada).
+        Las fechas fuera del rango se calculan con un índice temporal que las cubre.
+        """
+        dates = np.asarray(dates, dtype="datetime64[D]")
+        if not self.covers(dates):
+            return CalendarIndex(str(dates.min()), str(dates.max())).lookup(dates, sede)
+        index = self.day_index(dates)
+        flags = self.flags[index]
+        return {
+            "weekday": ((dates.astype(np.int64) + 3) % 7).astype(np.int8),
+            "month": self.month[index],
+            "is_weekend": (flags & WEEKEND) != 0,
+            "is_holiday": (flags & HOLIDAY) != 0,
+            "is_academic": (flags & self._sede_bit(sede)) != 0,
+        }
+
+    def is_holiday(self, day: Any) -> bool:
+        return bool(self.lookup(np.atleast_1d(np.datetime64(_as_date(day), "D")))["is_holiday"][0])
+
+    def is_academic(self, day: Any, sede: Optional[str] = None) -> bool:
+        return bool(self.lookup(np.atleast_1d(np.datetime64(_as_date(day), "D")), sede)["is_academic"][0])
+
+
+def _as_date(day: Any) -> Any:
+    return day.date() if isinstance(day, datetime) else day
+
+
+# Singleton para reutilización
+calendar_index = CalendarIndex()
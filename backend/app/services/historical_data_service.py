@@ -4,8 +4,18 @@ Objetivo 1: Proveer datos para entrenar/demostrar modelos de predicción
 """
 import random
 from datetime import datetime, timedelta
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Union
 import math
+import os
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+# Periodos académicos y festivos viven en el índice de calendario compartido
+from app.services.calendar_index import ACADEMIC_PERIODS, HOLIDAYS_FIXED, calendar_index  # noqa: F401
 
 # Constantes de simulación basadas en datos reales de universidades colombianas
 CAMPUS_PROFILES = {
@@ -43,23 +53,6 @@ CAMPUS_PROFILES = {
     }
 }
 
-# Periodos académicos típicos Colombia
-ACADEMIC_PERIODS = [
-    # Semestre 1: Feb-Jun
-    {"start_month": 2, "start_day": 1, "end_month": 6, "end_day": 15},
-    # Semestre 2: Ago-Dic
-    {"start_month": 8, "start_day": 1, "end_month": 12, "end_day": 10},
-]
-
-# Festivos Colombia (aproximados, varían por año)
-HOLIDAYS_FIXED = [
-    (1, 1),   # Año nuevo
-    (5, 1),   # Día del trabajo
-    (7, 20),  # Independencia
-    (8, 7),   # Batalla Boyacá
-    (12, 25), # Navidad
-]
-
 # Perfiles horarios por sector (factor multiplicador por hora)
 HOURLY_PROFILES = {
     "general": [0.15, 0.12, 0.10, 0.10, 0.12, 0.20, 0.45, 0.75, 0.95, 1.00, 1.00, 0.95, 0.85, 0.90, 0.95, 0.90, 0.80, 0.65, 0.50, 0.40, 0.35, 0.30, 0.25, 0.18],
@@ -69,6 +62,20 @@ HOURLY_PROFILES = {
     "salones": [0.05, 0.05, 0.05, 0.05, 0.08, 0.15, 0.60, 0.90, 1.00, 1.00, 1.00, 0.85, 0.75, 0.90, 1.00, 0.95, 0.85, 0.70, 0.45, 0.30, 0.20, 0.12, 0.08, 0.05],
 }
 
+# Distribución típica del consumo del campus por sector
+SECTOR_SHARES = {
+    "salones": 0.30,
+    "laboratorios": 0.25,
+    "oficinas": 0.18,
+    "comedores": 0.12,
+    "bibliotecas": 0.08,
+    "deportivo": 0.04,
+    "otros": 0.03
+}
+
+# Códigos de la columna `anomaly` en la salida columnar
+ANOMALY_LABELS = (None, "spike", "drop")
+
 
 class HistoricalDataGenerator:
     """Genera datos históricos simulados realistas para el período 2018-2025."""
@@ -88,16 +95,11 @@ class HistoricalDataGenerator:
 
     def is_holiday(self, date: datetime) -> bool:
         """Verifica si es festivo."""
-        return (date.month, date.day) in HOLIDAYS_FIXED
+        return calendar_index.is_holiday(date)
 
     def is_academic_period(self, date: datetime) -> bool:
         """Verifica si está en periodo académico."""
-        for period in ACADEMIC_PERIODS:
-            start = datetime(date.year, period["start_month"], period["start_day"])
-            end = datetime(date.year, period["end_month"], period["end_day"])
-            if start <= date <= end:
-                return True
-        return False
+        return calendar_index.is_academic(date, self.campus_code)
 
     def get_temperature(self, date: datetime) -> float:
         """Simula temperatura para la fecha."""
@@ -223,21 +225,229 @@ class HistoricalDataGenerator:
         self,
         start_year: int = 2018,
         end_year: int = 2025,
-        daily: bool = True
+        daily: bool = True,
+        seed: Optional[int] = None
     ) -> List[Dict[str, Any]]:
-        """Genera datos históricos para un rango de años."""
-        data = []
-        current = datetime(start_year, 1, 1)
-        end = datetime(end_year, 12, 31)
-        
-        while current <= end:
-            if daily:
-                data.append(self.generate_daily_consumption(current))
-            else:
-                data.extend(self.generate_hourly_consumption(current))
-            current += timedelta(days=1)
-        
-        return data
+        """Genera datos históricos para un rango de años (un dict por día u hora)."""
+        columns = self.generate_range_arrays(start_year, end_year, daily=daily, seed=seed)
+        if daily:
+            return [
+                {
+                    "date": date,
+                    "campus": self.campus_code,
+                    "consumption_kwh": round(total, 2),
+                    "temperature_c": round(temp, 1),
+                    "is_weekend": weekend,
+                    "is_holiday": holiday,
+                    "is_academic": academic,
+                    "anomaly": ANOMALY_LABELS[anomaly],
+                    "factors": {
+                        "weekday": round(weekday, 2),
+                        "academic": round(academic_f, 2),
+                        "covid": round(covid, 2),
+                        "efficiency": round(efficiency, 2)
+                    }
+                }
+                for date, total, temp, weekend, holiday, academic, anomaly, weekday, academic_f, covid, efficiency in zip(
+                    np.datetime_as_string(columns["date"]).tolist(),
+                    columns["consumption_kwh"].tolist(),
+                    columns["temperature_c"].tolist(),
+                    columns["is_weekend"].tolist(),
+                    columns["is_holiday"].tolist(),
+                    columns["is_academic"].tolist(),
+                    columns["anomaly"].tolist(),
+                    columns["weekday_factor"].tolist(),
+                    columns["academic_factor"].tolist(),
+                    columns["covid_factor"].tolist(),
+                    columns["efficiency_factor"].tolist(),
+                )
+            ]
+        return [
+            {
+                "timestamp": timestamp,
+                "hour": hour,
+                "consumption_kwh": round(value, 2),
+                "campus": self.campus_code,
+                "sector": "general"
+            }
+            for timestamp, hour, value in zip(
+                np.datetime_as_string(columns["timestamp"], unit="s").tolist(),
+                columns["hour"].tolist(),
+                columns["consumption_kwh"].tolist(),
+            )
+        ]
+
+    def generate_range_arrays(
+        self,
+        start_year: int = 2018,
+        end_year: int = 2025,
+        daily: bool = True,
+        sector: str = "general",
+        seed: Union[int, np.random.SeedSequence, None] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Versión vectorizada de generate_historical_range: todos los factores se
+        calculan como arrays NumPy sobre el índice de fechas y se devuelven
+        columnas (un array por campo). Con `seed` el resultado es reproducible.
+        Diario: date, consumption_kwh, temperature_c, is_weekend, is_holiday,
+        is_academic, anomaly (índice en ANOMALY_LABELS) y los factores.
+        Horario: timestamp, hour, consumption_kwh.
+        """
+        days = np.arange(f"{start_year}-01-01", f"{end_year + 1}-01-01", dtype="datetime64[D]")
+        return self._simulate_days(days, np.random.default_rng(seed), daily=daily, sector=sector)
+
+    def generate_period_arrays(
+        self,
+        start_date: datetime,
+        days: int,
+        daily: bool = True,
+        sector: str = "general",
+        seed: Union[int, np.random.SeedSequence, None] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Como generate_range_arrays para `days` días desde `start_date` (ventanas
+        de los endpoints). Cada mes natural usa su propio flujo aleatorio,
+        derivado de `seed` y del número de mes (SeedSequence con spawn_key), así
+        un día tiene el mismo valor en cualquier ventana que lo incluya.
+        """
+        root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        first = np.datetime64(start_date.date(), "D")
+        months = np.arange(first.astype("datetime64[M]"), (first + days - 1).astype("datetime64[M]") + 1)
+        chunks = []
+        for month in months:
+            stream = np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key + (int(month.astype(np.int64)),))
+            month_days = np.arange(month.astype("datetime64[D]"), (month + 1).astype("datetime64[D]"))
+            chunks.append(self._simulate_days(month_days, np.random.default_rng(stream), daily=daily, sector=sector))
+
+        # Recorte de los meses completos a la ventana pedida
+        per_day = 1 if daily else 24
+        offset = int((first - months[0].astype("datetime64[D]")).astype(np.int64)) * per_day
+        return {
+            key: np.concatenate([chunk[key] for chunk in chunks])[offset:offset + days * per_day]
+            for key in chunks[0]
+        }
+
+    def iter_range_chunks(
+        self,
+        start_year: int = 2018,
+        end_year: int = 2025,
+        daily: bool = False,
+        sector: str = "general",
+        chunk_days: Optional[int] = None,
+        seed: Union[int, np.random.SeedSequence, None] = None
+    ) -> Iterator[Dict[str, np.ndarray]]:
+        """
+        Como generate_range_arrays pero por tramos: entrega un dict de columnas
+        por mes natural (o cada `chunk_days` días) sin acumular el rango completo,
+        así la memoria no depende de la longitud del histórico.
+        Cada tramo usa su propio flujo aleatorio, derivado de `seed` y del índice
+        del tramo (SeedSequence con spawn_key), de modo que el resultado es
+        reproducible y no depende de cuántos tramos se consuman antes.
+        """
+        root = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+        start = np.datetime64(f"{start_year}-01-01", "D")
+        end = np.datetime64(f"{end_year + 1}-01-01", "D")
+        if chunk_days:
+            starts = np.arange(start, end, chunk_days)
+        else:
+            starts = np.arange(start.astype("datetime64[M]"), end.astype("datetime64[M]")).astype("datetime64[D]")
+        bounds = np.append(starts, end)
+
+        for i in range(len(starts)):
+            stream = np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key + (i,))
+            days = np.arange(bounds[i], bounds[i + 1])
+            yield self._simulate_days(days, np.random.default_rng(stream), daily=daily, sector=sector)
+
+    def _simulate_days(
+        self,
+        days: np.ndarray,
+        rng: np.random.Generator,
+        daily: bool = True,
+        sector: str = "general"
+    ) -> Dict[str, np.ndarray]:
+        """Mismo modelo que generate_daily_consumption/generate_hourly_consumption, sobre un vector de días."""
+        n = len(days)
+        month_index = days.astype("datetime64[M]").astype(np.int64)
+        year = month_index // 12 + 1970
+
+        # Calendario (índice precalculado)
+        calendar = calendar_index.lookup(days, self.campus_code)
+        month = calendar["month"].astype(np.int64)
+        is_weekend = calendar["is_weekend"]
+        is_holiday = calendar["is_holiday"]
+        is_academic = calendar["is_academic"]
+
+        # Factores
+        weekday_factor = np.where(is_weekend, 0.35, 1.0)
+        academic_factor = np.where(is_academic, self.profile["academic_boost"], 0.65)
+        holiday_factor = np.where(is_holiday, 0.25, 1.0)
+        # Factor COVID por mes del rango (pocos meses distintos en vez de n días)
+        first_month = int(month_index[0]) if n else 0
+        covid_by_month = np.ones(int(month_index[-1]) - first_month + 1 if n else 0)
+        for covid_year, covid_data in self.covid_factors.items():
+            for covid_month in covid_data["months"]:
+                index = (covid_year - 1970) * 12 + covid_month - 1 - first_month
+                if 0 <= index < len(covid_by_month):
+                    covid_by_month[index] = covid_data["factor"]
+        covid_factor = covid_by_month[month_index - first_month]
+        efficiency_factor = 1.0 - (year - 2018) * self.yearly_efficiency_improvement
+
+        seasonal = np.sin(np.arange(12) / 12 * 2 * np.pi) * self.profile["temp_variation"]
+        temp = self.profile["temp_avg"] + seasonal[month - 1] + rng.normal(0, 1.5, n)
+        temp_factor = 1.0 + np.abs(temp - 18) * 0.015
+        noise = rng.normal(1.0, 0.08, n)
+
+        total = (
+            self.profile["base_consumption_kwh"]
+            * weekday_factor
+            * academic_factor
+            * holiday_factor
+            * covid_factor
+            * efficiency_factor
+            * temp_factor
+            * noise
+        )
+
+        # Anomalías ocasionales (1%): pico x1.5-2.5 o caída x0.3-0.5
+        anomaly = np.zeros(n, dtype=np.int8)
+        hit = np.flatnonzero(rng.random(n) < 0.01)
+        is_spike = rng.random(len(hit)) < 0.5
+        anomaly[hit] = np.where(is_spike, 1, 2)
+        total[hit] *= np.where(is_spike, rng.uniform(1.5, 2.5, len(hit)), rng.uniform(0.3, 0.5, len(hit)))
+
+        if daily:
+            return {
+                "date": days,
+                "consumption_kwh": total,
+                "temperature_c": temp,
+                "is_weekend": is_weekend,
+                "is_holiday": is_holiday,
+                "is_academic": is_academic,
+                "anomaly": anomaly,
+                "weekday_factor": weekday_factor,
+                "academic_factor": academic_factor,
+                "covid_factor": covid_factor,
+                "efficiency_factor": efficiency_factor,
+            }
+
+        return self._split_hours(days, total, sector, rng)
+
+    @staticmethod
+    def _split_hours(
+        days: np.ndarray,
+        total: np.ndarray,
+        sector: str,
+        rng: np.random.Generator
+    ) -> Dict[str, np.ndarray]:
+        """Reparto horario de los totales diarios según el perfil del sector, con ruido por hora."""
+        profile = np.asarray(HOURLY_PROFILES.get(sector, HOURLY_PROFILES["general"]))
+        shares = profile / profile.sum()
+        hourly = total[:, None] * shares[None, :] * rng.normal(1.0, 0.05, (len(days), 24))
+        return {
+            "timestamp": (days[:, None].astype("datetime64[h]") + np.arange(24)).ravel(),
+            "hour": np.tile(np.arange(24, dtype=np.int8), len(days)),
+            "consumption_kwh": hourly.ravel(),
+        }
 
     def generate_sector_breakdown(
         self,
@@ -246,19 +456,8 @@ class HistoricalDataGenerator:
         """Genera desglose de consumo por sector para un día."""
         daily_total = self.generate_daily_consumption(date)["consumption_kwh"]
         
-        # Distribución típica por sector
-        sector_distribution = {
-            "salones": 0.30,
-            "laboratorios": 0.25,
-            "oficinas": 0.18,
-            "comedores": 0.12,
-            "bibliotecas": 0.08,
-            "deportivo": 0.04,
-            "otros": 0.03
-        }
-        
         sectors = {}
-        for sector, ratio in sector_distribution.items():
+        for sector, ratio in SECTOR_SHARES.items():
             noise = random.gauss(1.0, 0.1)
             sectors[sector] = round(daily_total * ratio * noise, 2)
         
@@ -303,5 +502,85 @@ def generate_demo_dataset(
     }
 
 
+# A partir de este total de filas el dataset se reparte en un pool de procesos
+DATASET_POOL_MIN_ROWS = 5_000_000
+
+
+def generate_dataset(
+    campuses: Optional[List[str]] = None,
+    sectors: Optional[List[str]] = None,
+    start_year: int = 2018,
+    end_year: int = 2025,
+    daily: bool = True,
+    seed: Optional[int] = None,
+    workers: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Dataset sintético de todas las combinaciones sede × sector (por defecto
+    CAMPUS_PROFILES × HOURLY_PROFILES) en una sola tabla columnar, con `campus`
+    y `sector` como categorías. La serie diaria de cada sede (temperatura,
+    ruido, anomalías) se simula una sola vez: "general" es ese total y cada
+    sector es su parte según SECTOR_SHARES, repartida por horas con el perfil
+    del sector. Lanza ValueError con sectores sin participación (o, en modo
+    horario, sin perfil horario).
+    Cada sede tiene su propio flujo aleatorio, derivado de `seed` y de su
+    nombre (y del sector para el ruido horario): el resultado no depende del
+    orden ni del número de workers. Los trabajos grandes (DATASET_POOL_MIN_ROWS)
+    se reparten por sede en un pool de `workers` procesos (por defecto uno por núcleo).
+    """
+    campuses = list(campuses or CAMPUS_PROFILES)
+    sectors = list(sectors or HOURLY_PROFILES)
+    unknown = [
+        sector for sector in sectors
+        if sector != "general" and (sector not in SECTOR_SHARES or (not daily and sector not in HOURLY_PROFILES))
+    ]
+    if unknown:
+        raise ValueError(f"Sectores desconocidos: {unknown}")
+    root = np.random.SeedSequence(seed)
+    tasks = [
+        (campus, tuple(sectors), start_year, end_year, daily,
+         np.random.SeedSequence(root.entropy, spawn_key=root.spawn_key + (zlib.crc32(campus.encode()),)))
+        for campus in campuses
+    ]
+
+    n_days = (np.datetime64(f"{end_year + 1}-01-01") - np.datetime64(f"{start_year}-01-01")).astype(np.int64)
+    rows = len(tasks) * len(sectors) * n_days * (1 if daily else 24)
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    if workers > 1 and len(tasks) > 1 and rows >= DATASET_POOL_MIN_ROWS:
+        # spawn: mismo criterio que el resto de pools del backend
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks)), mp_context=get_context("spawn")) as pool:
+            per_campus = list(pool.map(_generate_task, tasks))
+    else:
+        per_campus = [_generate_task(task) for task in tasks]
+    parts = [part for campus_parts in per_campus for part in campus_parts]
+
+    lengths = [len(part["consumption_kwh"]) for part in parts]
+    table = {
+        "campus": pd.Categorical.from_codes(np.repeat(np.arange(len(parts)) // len(sectors), lengths), categories=campuses),
+        "sector": pd.Categorical.from_codes(np.repeat(np.arange(len(parts)) % len(sectors), lengths), categories=sectors),
+    }
+    for column in parts[0] if parts else []:
+        table[column] = np.concatenate([part[column] for part in parts])
+    return pd.DataFrame(table)
+
+
+def _generate_task(task: tuple) -> List[Dict[str, np.ndarray]]:
+    """Una sede: su serie diaria y una tabla por sector (se ejecuta en un proceso del pool)."""
+    campus, sectors, start_year, end_year, daily, stream = task
+    generator = HistoricalDataGenerator(campus)
+    days = np.arange(f"{start_year}-01-01", f"{end_year + 1}-01-01", dtype="datetime64[D]")
+    campus_days = generator._simulate_days(days, np.random.default_rng(stream), daily=True)
+
+    parts = []
+    for sector in sectors:
+        total = campus_days["consumption_kwh"] * (1.0 if sector == "general" else SECTOR_SHARES[sector])
+        if daily:
+            parts.append({**campus_days, "consumption_kwh": total})
+        else:
+            sector_stream = np.random.SeedSequence(stream.entropy, spawn_key=stream.spawn_key + (zlib.crc32(sector.encode()),))
+            parts.append(generator._split_hours(days, total, sector, np.random.default_rng(sector_stream)))
+    return parts
+
+
 # Singleton para reutilización
 historical_generator = HistoricalDataGenerator()
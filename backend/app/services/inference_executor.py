@@ -0,0 +1,240 @@
+"""
+Ejecutor de Inferencia en Procesos Dedicados
+Saca Prophet/XGBoost del event loop y del lock global de PredictionService:
+cada proceso del pool mantiene su propia instancia del servicio (con sus
+modelos cargados), de modo que las inferencias de distintas sedes corren en
+paralelo usando todos los núcleos.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import get_settings
+from app.core.exceptions import ServiceOverloadedError
+
+logger = logging.getLogger("app")
+
+# Instancia de PredictionService propia de cada proceso worker
+_worker_service = None
+
+
+def _init_worker(models_path: str, warm_up: bool) -> None:
+    """Inicializador de cada proceso: crea su propio PredictionService (y lo calienta)."""
+    global _worker_service
+    from app.services.prediction_service import PredictionService
+    _worker_service = PredictionService(models_path=models_path)
+    if warm_up:
+        _worker_service.warm_up()
+    interval = get_settings().model_watch_interval_seconds
+    if interval > 0:
+        _worker_service.start_model_watcher(interval)
+
+
+def _run_in_worker(method: str, args: tuple, kwargs: dict) -> Any:
+    """Ejecuta un método del servicio dentro del proceso worker."""
+    return getattr(_worker_service, method)(*args, **kwargs)
+
+
+def _worker_ready() -> Tuple[int, Dict[str, str]]:
+    """PID del proceso y estado de sus modelos (el inicializador ya los calentó)."""
+    return os.getpid(), dict(_worker_service.model_status)
+
+
+class InferenceExecutor:
+    """
+    Pool de procesos para inferencia con cola acotada.
+    Con max_workers=0 ejecuta en un hilo del proceso actual (útil en tests/Windows).
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        max_queue: int = 64,
+        models_path: Optional[str] = None,
+        warm_up_workers: bool = False,
+    ):
+        self.max_workers = (os.cpu_count() or 1) if max_workers is None else max_workers
+        self.max_queue = max(1, max_queue)
+        self.models_path = models_path
+        self.warm_up_workers = warm_up_workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._completed = 0
+        self._failed = 0
+        self._cancelled = 0
+        self._rejected = 0
+        self._coalesced = 0
+        self._max_pending = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+        # Clave de llamada -> tarea en curso (solo se accede desde el event loop)
+        self._in_flight: Dict[tuple, asyncio.Future] = {}
+
+    def _new_pool(self, warm_up: bool) -> ProcessPoolExecutor:
+        from app.services.prediction_service import prediction_service
+        models_path = str(self.models_path or prediction_service.models_path)
+        # 'spawn' evita heredar hilos/locks del servidor (y es lo que usa Windows)
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(models_path, warm_up),
+        )
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = self._new_pool(self.warm_up_workers)
+            logger.info(f"InferenceExecutor iniciado con {self.max_workers} procesos.")
+        return self._pool
+
+    async def submit(self, method: str, *args, **kwargs) -> Any:
+        """
+        Ejecuta `prediction_service.<method>(*args, **kwargs)` fuera del event loop.
+        Llamadas idénticas concurrentes se agrupan en una sola ejecución (single-flight):
+        sin esto, cada una caería en un proceso distinto y repetiría el mismo Prophet.
+        Lanza ServiceOverloadedError si la cola está llena.
+        """
+        key = self._flight_key(method, args, kwargs)
+        in_flight = self._in_flight.get(key) if key is not None else None
+        if in_flight is not None:
+            self._coalesced += 1
+            # shield: si este cliente se desconecta, el cálculo sigue para los demás
+            return await asyncio.shield(in_flight)
+
+        if self._pending >= self.max_queue:
+            self._rejected += 1
+            raise ServiceOverloadedError(f"Cola de inferencia llena ({self.max_queue} pendientes)")
+        # El cupo se reserva aquí, antes de ceder el loop: si se tomara en _execute,
+        # todas las llamadas de una ráfaga pasarían el control con la cola vacía
+        self._pending += 1
+        self._max_pending = max(self._max_pending, self._pending)
+
+        task = asyncio.ensure_future(self._execute(method, args, kwargs))
+        if key is not None:
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    @staticmethod
+    def _flight_key(method: str, args: tuple, kwargs: dict) -> Optional[tuple]:
+        """Clave de agrupación; None si los argumentos no son hashables (p. ej. lotes de filas)."""
+        key = (method, args, tuple(sorted(kwargs.items())))
+        try:
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    async def _execute(self, method: str, args: tuple, kwargs: dict) -> Any:
+        """Ejecuta una llamada con su cupo ya reservado por submit y lo libera al terminar."""
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            if self.max_workers == 0:
+                from app.services.prediction_service import prediction_service
+                result = await asyncio.to_thread(getattr(prediction_service, method), *args, **kwargs)
+            else:
+                result = await loop.run_in_executor(self._get_pool(), _run_in_worker, method, args, kwargs)
+        except asyncio.CancelledError:
+            self._cancelled += 1
+            raise
+        except Exception:
+            self._failed += 1
+            raise
+        finally:
+            self._pending -= 1
+        # Latencias solo de las tareas terminadas con éxito
+        elapsed = time.perf_counter() - started
+        self._latency_total += elapsed
+        self._latency_max = max(self._latency_max, elapsed)
+        self._completed += 1
+        return result
+
+    async def warm_up(self) -> Dict[str, str]:
+        """
+        Arranca todos los procesos del pool; cada uno precarga y calienta sus
+        modelos en el inicializador antes de aceptar trabajo. Devuelve el estado
+        de los modelos (el peor de cada modelo entre los procesos).
+        """
+        if self.max_workers == 0:
+            return {}
+        return await self._await_workers(self._get_pool())
+
+    async def _await_workers(self, pool: ProcessPoolExecutor) -> Dict[str, str]:
+        """
+        Espera a que respondan max_workers procesos distintos del pool. Un proceso
+        ya listo puede atender varios sondeos seguidos mientras los demás siguen
+        cargando, así que se cuentan PIDs únicos, no respuestas.
+        """
+        loop = asyncio.get_running_loop()
+        statuses: Dict[int, Dict[str, str]] = {}
+        while True:
+            probes = [loop.run_in_executor(pool, _worker_ready) for _ in range(self.max_workers - len(statuses))]
+            for pid, status in await asyncio.gather(*probes):
+                statuses[pid] = status
+            if len(statuses) >= self.max_workers:
+                break
+            await asyncio.sleep(0.1)
+
+        merged: Dict[str, str] = {}
+        for status in statuses.values():
+            for model_key, state in status.items():
+                if merged.get(model_key, "loaded") == "loaded":
+                    merged[model_key] = state
+        return merged
+
+    async def reload(self) -> bool:
+        """
+        Renueva los procesos del pool sin cortar el servicio: arranca un pool nuevo
+        (que carga y calienta los modelos actuales del disco), lo publica y deja que
+        el anterior termine sus tareas en curso. Devuelve False si no había pool.
+        """
+        if self.max_workers == 0 or self._pool is None:
+            return False
+        new_pool = self._new_pool(warm_up=True)
+        try:
+            await self._await_workers(new_pool)
+        except Exception:
+            new_pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        old_pool, self._pool = self._pool, new_pool
+        old_pool.shutdown(wait=False)
+        logger.info("InferenceExecutor: procesos renovados con los modelos actuales.")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Métricas de la cola de inferencia (latencia = espera en cola + ejecución).
+        max_pending nunca supera queue_size: lo que no cabe se cuenta en rejected.
+        """
+        return {
+            "workers": self.max_workers,
+            "queue_size": self.max_queue,
+            "pending": self._pending,
+            "max_pending": self._max_pending,
+            "completed": self._completed,
+            "failed": self._failed,
+            "cancelled": self._cancelled,
+            "rejected": self._rejected,
+            "coalesced": self._coalesced,
+            "avg_latency_ms": round(1000 * self._latency_total / self._completed, 2) if self._completed else 0.0,
+            "max_latency_ms": round(1000 * self._latency_max, 2),
+        }
+
+    def shutdown(self) -> None:
+        """Detiene los procesos del pool (llamado al apagar la aplicación)."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+_settings = get_settings()
+inference_executor = InferenceExecutor(
+    max_workers=_settings.inference_workers,
+    max_queue=_settings.inference_queue_size,
+    warm_up_workers=_settings.model_warmup_on_startup,
+)
@@ -0,0 +1,161 @@
+"""
+Formato Nativo de Artefactos de Modelos
+Alternativa a los .pkl de joblib en ml_models/:
+- XGBoost: booster en formato nativo UBJ (`xgb_energia.ubj`), sin pickle del wrapper sklearn.
+- Prophet: serializador JSON oficial (`prophet_uptc_tun.json`) y, para la vía rápida,
+  los parámetros compilados como arrays .npy (`prophet_uptc_tun.fast/`) que se
+  cargan con memory-mapping y se comparten entre procesos vía page cache.
+Los .pkl siguen funcionando como respaldo (cargados con mmap_mode="r").
+"""
+import json
+import logging
+from dataclasses import fields
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+
+from app.services.prophet_fast import CompiledProphet
+
+logger = logging.getLogger("app")
+
+_ARRAY_FIELDS = {"deltas", "changepoints_t", "beta_add", "beta_mult", "holiday_cols", "holiday_table"}
+
+
+def _stem(filename: str) -> str:
+    return filename.rsplit(".", 1)[0]
+
+
+def native_path(models_path: Path, filename: str) -> Path:
+    """Ruta del artefacto nativo equivalente a un .pkl de MODEL_FILES."""
+    stem = _stem(filename)
+    suffix = ".json" if stem.startswith("prophet") else ".ubj"
+    return Path(models_path) / f"{stem}{suffix}"
+
+
+def compiled_path(models_path: Path, filename: str) -> Path:
+    """Directorio con los parámetros compilados de un modelo Prophet."""
+    return Path(models_path) / f"{_stem(filename)}.fast"
+
+
+def resolve_artifact(models_path: Path, filename: str) -> Optional[Path]:
+    """
+    Artefacto a cargar: el nativo si existe y no es más antiguo que el .pkl
+    (un .pkl recién copiado tiene prioridad hasta volver a convertir).
+    """
+    legacy = Path(models_path) / filename
+    native = native_path(models_path, filename)
+    if native.exists() and (not legacy.exists() or native.stat().st_mtime_ns >= legacy.stat().st_mtime_ns):
+        return native
+    return legacy if legacy.exists() else None
+
+
+def load_artifact(path: Path) -> Any:
+    """Carga un artefacto según su extensión."""
+    if path.suffix == ".ubj":
+        import xgboost as xgb
+        model = xgb.XGBRegressor()
+        model.load_model(str(path))
+        return model
+    if path.suffix == ".json":
+        from prophet.serialize import model_from_json
+        return model_from_json(path.read_text(encoding="utf-8"))
+    # Pickle heredado: los arrays numpy sin comprimir se mapean en memoria en lugar de copiarse
+    return joblib.load(path, mmap_mode="r")
+
+
+def strip_prophet_for_inference(model: Any) -> None:
+    """
+    Quita del Prophet ajustado lo que predict() no usa: la historia de
+    entrenamiento (se dejan 2 filas, predict exige que exista y el muestreo de
+    tendencia usa su paso temporal), el ajuste de Stan y la tendencia ajustada
+    por fila de historia. Pensado para precargar antes de fork().
+    """
+    if getattr(model, "history", None) is not None:
+        model.history = model.history.tail(2).copy()
+    model.history_dates = None
+    model.stan_fit = None
+    model.stan_backend = None
+    if isinstance(getattr(model, "params", None), dict):
+        model.params.pop("trend", None)
+
+
+def save_compiled_prophet(compiled: CompiledProphet, directory: Path) -> None:
+    """Guarda los parámetros compilados: escalares en meta.json y arrays como .npy."""
+    directory.mkdir(parents=True, exist_ok=True)
+    meta: Dict[str, Any] = {}
+    for f in fields(compiled):
+        value = getattr(compiled, f.name)
+        if f.name in _ARRAY_FIELDS:
+            if value is not None:
+                np.save(directory / f"{f.name}.npy", np.ascontiguousarray(value))
+        else:
+            meta[f.name] = value
+    (directory / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+
+def compiled_is_current(directory: Path, artifact: Path) -> bool:
+    """Los parámetros compilados valen si se generaron después del artefacto cargado."""
+    meta = directory / "meta.json"
+    return meta.exists() and meta.stat().st_mtime_ns >= artifact.stat().st_mtime_ns
+
+
+def load_compiled_prophet(directory: Path) -> CompiledProphet:
+    """Carga los parámetros compilados con los arrays mapeados en memoria (solo lectura)."""
+    meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+    meta["seasonalities"] = [tuple(s) for s in meta["seasonalities"]]
+    meta["interval"] = tuple(meta["interval"])
+    for name in _ARRAY_FIELDS:
+        array_file = directory / f"{name}.npy"
+        meta[name] = np.load(array_file, mmap_mode="r") if array_file.exists() else None
+    return CompiledProphet(**meta)
+
+
+def convert_models(models_path: Path, model_files: Dict[str, str], tolerance: float = 1e-6) -> List[str]:
+    """
+    Convierte los .pkl de `model_files` al formato nativo (y compila los Prophet
+    para la vía rápida si pasan la verificación de exactitud). Devuelve las rutas escritas.
+    """
+    written: List[str] = []
+    for model_key, filename in model_files.items():
+        source = Path(models_path) / filename
+        if not source.exists():
+            logger.warning(f"No existe {source}, se omite.")
+            continue
+
+        model = joblib.load(source)
+        target = native_path(models_path, filename)
+        if model_key.startswith("prophet"):
+            from prophet.serialize import model_to_json
+            target.write_text(model_to_json(model), encoding="utf-8")
+        else:
+            model.save_model(str(target))
+        written.append(str(target))
+
+        if model_key.startswith("prophet"):
+            directory = write_compiled_prophet(model, models_path, filename, tolerance)
+            if directory is not None:
+                written.append(str(directory))
+    return written
+
+
+def write_compiled_prophet(model: Any, models_path: Path, filename: str, tolerance: float = 1e-6) -> Optional[Path]:
+    """
+    Compila un Prophet para la vía rápida y lo guarda junto a su artefacto si
+    pasa la verificación de exactitud. Devuelve el directorio escrito o None.
+    """
+    import pandas as pd
+    from app.services.prophet_fast import check_accuracy, compile_prophet
+
+    compiled = compile_prophet(model)
+    if compiled is None:
+        return None
+    probe = pd.date_range(pd.Timestamp.now().normalize() - pd.Timedelta(days=30), periods=60, freq="D").to_numpy()
+    accuracy = check_accuracy(model, compiled, probe)
+    if accuracy["max_rel_error"] > tolerance:
+        logger.warning(f"{_stem(filename)}: vía rápida descartada ({accuracy})")
+        return None
+    directory = compiled_path(models_path, filename)
+    save_compiled_prophet(compiled, directory)
+    return directory
@@ -0,0 +1,178 @@
+"""
+Reentrenamiento Incremental de Prophet
+Añade a la historia de cada modelo vigente los días nuevos de consumption_records
+(electricidad, suma diaria por sede) y reajusta con arranque en caliente: `init=`
+con los parámetros del ajuste anterior, de modo que el optimizador parte casi
+de la solución. Las sedes se reentrenan en procesos paralelos. Cada ajuste se
+publica como artefacto versionado en ml_models/versions/ y después reemplaza de
+forma atómica el artefacto activo (.json), que la recarga en caliente detecta
+por su versión.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from multiprocessing import get_context
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.calendar_index import campus_code_for
+from app.services.model_artifacts import load_artifact, native_path, resolve_artifact, write_compiled_prophet
+
+logger = logging.getLogger("app")
+
+
+def warm_start_params(model: Any) -> Dict[str, Any]:
+    """Parámetros del ajuste anterior en el formato de `Prophet.fit(init=...)`."""
+    params = {}
+    for name in ("k", "m", "sigma_obs"):
+        params[name] = float(np.mean(model.params[name]))
+    for name in ("delta", "beta"):
+        params[name] = np.mean(model.params[name], axis=0)
+    return params
+
+
+def merge_history(history: Optional[pd.DataFrame], readings: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+    """
+    Historia previa (ds, y) más los días de `readings` posteriores al último día
+    ya ajustado. Devuelve la historia combinada y el número de días nuevos.
+    """
+    readings = readings[["ds", "y"]].copy()
+    readings["ds"] = pd.to_datetime(readings["ds"]).dt.tz_localize(None).dt.normalize()
+    readings = readings.groupby("ds", as_index=False)["y"].sum()
+    if history is None or not len(history):
+        return readings.reset_index(drop=True), len(readings)
+    previous = history[["ds", "y"]]
+    new_days = readings[readings["ds"] > previous["ds"].max()]
+    return pd.concat([previous, new_days], ignore_index=True), len(new_days)
+
+
+def refit_prophet(model: Any, history: pd.DataFrame) -> Tuple[Any, bool]:
+    """
+    Reajusta una copia de `model` (misma configuración, festivos y
+    estacionalidades) sobre `history`. Intenta arranque en caliente y, si los
+    parámetros no encajan con el nuevo ajuste, hace un ajuste en frío.
+    Devuelve el modelo y si se usó el arranque en caliente.
+    """
+    from prophet.diagnostics import prophet_copy
+
+    init = warm_start_params(model)
+    refit = prophet_copy(model)
+    try:
+        refit.fit(history, init=init)
+        return refit, True
+    except Exception as e:
+        logger.warning(f"Arranque en caliente no aplicable ({e}); ajuste en frío")
+    refit = prophet_copy(model)
+    refit.fit(history)
+    return refit, False
+
+
+def publish_prophet(model: Any, models_path: Path, filename: str, keep: int = 5, tolerance: float = 1e-6) -> str:
+    """
+    Guarda el modelo como ml_models/versions/<modelo>/<versión>.json, reemplaza
+    el artefacto activo de forma atómica, regenera la vía rápida y borra las
+    versiones más antiguas (se conservan `keep`). Devuelve la versión publicada.
+    """
+    from prophet.serialize import model_to_json
+
+    models_path = Path(models_path)
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+    versions_dir = models_path / "versions" / filename.rsplit(".", 1)[0]
+    versions_dir.mkdir(parents=True, exist_ok=True)
+    payload = model_to_json(model)
+    (versions_dir / f"{version}.json").write_text(payload, encoding="utf-8")
+
+    # Escritura en temporal + os.replace: los lectores nunca ven un archivo a medias
+    target = native_path(models_path, filename)
+    staging = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    staging.write_text(payload, encoding="utf-8")
+    os.replace(staging, target)
+    # Después del .json, para que los parámetros compilados cuenten como vigentes
+    write_compiled_prophet(model, models_path, filename, tolerance)
+
+    for old in sorted(versions_dir.glob("*.json"))[:-max(keep, 1)]:
+        old.unlink()
+    return version
+
+
+def refit_campus(model_key: str, models_path: str, filename: str, readings: pd.DataFrame,
+                 keep: int = 5, tolerance: float = 1e-6) -> Dict[str, Any]:
+    """Reentrena y publica un modelo (se ejecuta en un proceso del pool)."""
+    import time
+
+    artifact = resolve_artifact(Path(models_path), filename)
+    if artifact is None:
+        return {"status": "missing"}
+    model = load_artifact(artifact)
+    history, new_days = merge_history(getattr(model, "history", None), readings)
+    if not new_days:
+        return {"status": "unchanged", "history_days": len(history)}
+
+    start = time.perf_counter()
+    refit, warm = refit_prophet(model, history)
+    version = publish_prophet(refit, Path(models_path), filename, keep=keep, tolerance=tolerance)
+    return {
+        "status": "refit",
+        "version": version,
+        "new_days": new_days,
+        "history_days": len(history),
+        "warm_start": warm,
+        "fit_seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def refit_all(models_path: Path, model_files: Dict[str, str], readings: Dict[str, pd.DataFrame],
+              workers: int = 4, keep: int = 5, tolerance: float = 1e-6) -> Dict[str, Dict[str, Any]]:
+    """
+    Reentrena en paralelo los modelos con lecturas en `readings` (model_key ->
+    DataFrame ds, y). Con workers=0 se ejecuta en el proceso actual.
+    """
+    jobs = {key: frame for key, frame in readings.items() if key in model_files and len(frame)}
+    results: Dict[str, Dict[str, Any]] = {}
+    if workers == 0 or len(jobs) <= 1:
+        for key, frame in jobs.items():
+            results[key] = _safe_refit(key, str(models_path), model_files[key], frame, keep, tolerance)
+        return results
+
+    # spawn: el ajuste de Stan no debe heredar hilos ni locks del proceso padre
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), mp_context=get_context("spawn")) as pool:
+        futures = {
+            key: pool.submit(_safe_refit, key, str(models_path), model_files[key], frame, keep, tolerance)
+            for key, frame in jobs.items()
+        }
+        for key, future in futures.items():
+            results[key] = future.result()
+    return results
+
+
+def _safe_refit(model_key: str, models_path: str, filename: str, readings: pd.DataFrame,
+                keep: int, tolerance: float) -> Dict[str, Any]:
+    try:
+        return refit_campus(model_key, models_path, filename, readings, keep, tolerance)
+    except Exception as e:
+        logger.error(f"Reentrenamiento de {model_key} fallido: {e}")
+        return {"status": "error", "error": str(e)}
+
+
+async def load_daily_readings(db: Any, prophet_models: Dict[str, str], resource_type: str = "electricity") -> Dict[str, pd.DataFrame]:
+    """Consumo diario (suma de lecturas) por modelo Prophet, a partir de consumption_records."""
+    from sqlalchemy import func, select
+    from app.models.campus import Campus, ConsumptionRecord
+
+    day = func.date(ConsumptionRecord.reading_date)
+    result = await db.execute(
+        select(Campus.name, Campus.location_city, day, func.sum(ConsumptionRecord.reading_value))
+        .join(Campus, Campus.id == ConsumptionRecord.campus_id)
+        .where(ConsumptionRecord.resource_type == resource_type)
+        .group_by(Campus.id, Campus.name, Campus.location_city, day)
+    )
+    rows: Dict[str, list] = {}
+    for name, city, reading_day, total in result.all():
+        code = campus_code_for(name, city)
+        if code in prophet_models:
+            rows.setdefault(prophet_models[code], []).append((reading_day, float(total)))
+    return {key: pd.DataFrame(values, columns=["ds", "y"]) for key, values in rows.items()}
@@ -1,17 +1,27 @@
+import asyncio
 import os
-import joblib
+import numpy as np
 import pandas as pd
 import logging
-from typing import Dict, Any, Optional, List
+from typing import AsyncIterator, Dict, Any, Optional, List, Tuple
 from datetime import datetime, timedelta
+from app.core.cache import SingleFlight, build_cache
 from app.core.config import get_settings
+from app.services.model_artifacts import (
+    compiled_is_current, compiled_path, load_artifact, load_compiled_prophet, resolve_artifact,
+    strip_prophet_for_inference,
+)
+from app.services.prophet_fast import CompiledProphet, check_accuracy, compile_prophet, fast_predict
+from app.services import xgb_fast
+from app.services.calendar_index import calendar_index
+from app.services.historical_data_service import HOURLY_PROFILES
 
 logger = logging.getLogger("app")
 
 class PredictionService:
     """
     Servicio robusto para cargar y ejecutar inferencias sobre los modelos de ML.
-    Incluye: caché de predicciones, validación de features y fallbacks.
+    Incluye: caché de predicciones (LRU + TTL acotado), validación de features y fallbacks.
     """
     
     # Features requeridas por XGBoost según metadata de Miguel
@@ -36,110 +46,546 @@ class PredictionService:
         'oficinas': {'agua': 0.007708, 'ocupacion': 0.087341}
     }
 
-    def __init__(self):
+    # Artefactos de modelos en ml_models/
+    MODEL_FILES: Dict[str, str] = {
+        "prophet_tun": "prophet_uptc_tun.pkl",
+        "prophet_dui": "prophet_uptc_dui.pkl",
+        "prophet_sog": "prophet_uptc_sog.pkl",
+        "prophet_chi": "prophet_uptc_chi.pkl",
+        "xgb_agua": "xgb_agua.pkl",
+        "xgb_energia": "xgb_energia.pkl",
+        "xgb_ocupacion": "xgb_ocupacion.pkl"
+    }
+
+    # Mapeo de código de sede al modelo Prophet correspondiente
+    PROPHET_MODELS: Dict[str, str] = {
+        "tun": "prophet_tun",
+        "dui": "prophet_dui",
+        "sog": "prophet_sog",
+        "chi": "prophet_chi"
+    }
+
+    # Valores por defecto de las entradas de XGBoost (mismos que build_xgb_features)
+    XGB_INPUT_DEFAULTS: Dict[str, Any] = {
+        'hora': 12, 'num_estudiantes': 5000, 'num_edificios': 10, 'area_m2': 15000.0,
+        'temp_promedio_c': 18.0, 'lag_1h': 100.0, 'lag_24h': 2400.0,
+        # None: del índice de calendario para la fecha (hoy si no hay marcas por fila)
+        'es_festivo': None, 'en_periodo_academico': None
+    }
+
+    # Columnas comunes a los tres modelos XGBoost (en orden); les siguen las 2 de lag del recurso
+    XGB_SHARED_FEATURES: List[str] = REQUIRED_FEATURES[:11]
+
+    # A partir de este tamaño de lote los tres boosters se ejecutan en hilos paralelos
+    XGB_PARALLEL_MIN_ROWS: int = 256
+
+    # El evaluador NumPy gana en filas sueltas y lotes pequeños; por encima, el predict multihilo de XGBoost
+    XGB_FAST_MAX_ROWS: int = 2048
+
+    # Tope de puntos de un barrido what-if (producto cartesiano de los ejes)
+    SCENARIO_MAX_POINTS: int = 250_000
+
+    # Tabla precalculada por sede: buckets de área (log-espaciados) y entradas que puede resolver
+    IMPACT_GRID_AREAS: np.ndarray = np.geomspace(10.0, 200_000.0, 161)
+    IMPACT_GRID_INPUTS = frozenset({'hora', 'area_m2', 'es_festivo', 'en_periodo_academico'})
+
+    # Columnas de lag por recurso y factor de escala aplicado al valor bruto
+    LAG_FEATURES: Dict[str, tuple] = {
+        'energia': ('energia_total_kwh_lag_1h', 'energia_total_kwh_lag_24h', 1.0),
+        'agua': ('agua_litros_lag_1h', 'agua_litros_lag_24h', 1.0),
+        'ocupacion': ('ocupacion_pct_lag_1h', 'ocupacion_pct_lag_24h', 0.01),
+    }
+
+    # Modelos XGBoost, tipo de recurso y clave de resultado
+    XGB_MODELS_CONFIG: List[tuple] = [
+        ("xgb_energia", "energia", "energy_prediction"),
+        ("xgb_agua", "agua", "water_prediction"),
+        ("xgb_ocupacion", "ocupacion", "occupancy_prediction")
+    ]
+
+    def __init__(self, models_path: Optional[str] = None):
         # Usar pathlib para que las rutas sean relativas al archivo, no al directorio de trabajo
         from pathlib import Path
         import threading
         current_file = Path(__file__).resolve()
-        self.models_path = current_file.parent.parent / "ml_models"
-        self.models: Dict[str, Any] = {}
+        self.models_path = Path(models_path) if models_path else current_file.parent.parent / "ml_models"
+        # model_key -> (modelo, versión); se publica siempre un dict nuevo, nunca se modifica
+        self._loaded: Dict[str, Tuple[Any, str]] = {}
         self._lock = threading.Lock() # Bloqueo para evitar colapsos en Windows
-        self._prediction_cache: Dict[str, Dict[str, Any]] = {}
-        self._cache_ttl_minutes = 60
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        # model_key -> versión que falló la validación (no se reintenta hasta que cambie)
+        self._rejected_versions: Dict[str, str] = {}
+        self._watcher: Optional[threading.Thread] = None
+        self._watcher_stop = threading.Event()
+        if hasattr(os, "register_at_fork"):
+            import weakref
+            ref = weakref.ref(self)
+            os.register_at_fork(after_in_child=lambda: ref() and ref()._after_fork_in_child())
+        settings = get_settings()
+        self._cache_ttl_minutes = settings.forecast_cache_ttl_minutes
+        self._prediction_cache = build_cache(
+            settings.forecast_cache_backend,
+            path=settings.forecast_cache_path,
+            max_entries=settings.forecast_cache_max_entries,
+            max_bytes=settings.forecast_cache_max_bytes,
+            ttl_seconds=self._cache_ttl_minutes * 60,
+        )
+        self._prediction_cache.start_sweeper()
+        self._single_flight = SingleFlight()
+        self._superset_past_days = settings.forecast_superset_past_days
+        self._superset_future_days = settings.forecast_superset_future_days
+        self._prophet_fast_mode = settings.prophet_fast_mode
+        self._prophet_fast_tolerance = settings.prophet_fast_tolerance
+        # model_key -> (versión, modelo compilado o None si no es apto para la vía rápida)
+        self._fast_prophet: Dict[str, tuple] = {}
+        self._xgb_fast_mode = settings.xgb_fast_mode
+        self._xgb_fast_tolerance = settings.xgb_fast_tolerance
+        # model_key -> (versión, ensamble compilado o None)
+        self._fast_xgb: Dict[str, tuple] = {}
+        self._model_locks = {key: threading.Lock() for key, _, _ in self.XGB_MODELS_CONFIG}
+        # Con el pool de inferencia ya hay un proceso por núcleo: un hilo por booster
+        # evita procesos x boosters x hilos compitiendo por los mismos núcleos
+        if settings.xgb_nthread:
+            self._xgb_nthread = settings.xgb_nthread
+        elif settings.inference_workers != 0:
+            self._xgb_nthread = 1
+        else:
+            self._xgb_nthread = max(1, (os.cpu_count() or 1) // len(self.XGB_MODELS_CONFIG))
+        self._xgb_executor = None
+        # Estado de calentamiento: pending | warming | ready | failed (ver app.main)
+        self.readiness_state = "pending"
+        self.model_status: Dict[str, str] = {}
         logger.info("PredictionService initialized (Lazy Loading mode).")
 
+    @property
+    def models(self) -> Dict[str, Any]:
+        return {key: model for key, (model, _) in self._loaded.items()}
+
+    @property
+    def model_versions(self) -> Dict[str, str]:
+        return {key: version for key, (_, version) in self._loaded.items()}
+
     def _get_model(self, model_key: str):
         """Carga el modelo solo cuando se necesita (Lazy Loading)."""
-        model_files = {
-            "prophet_tun": "prophet_uptc_tun.pkl",
-            "prophet_dui": "prophet_uptc_dui.pkl",
-            "prophet_sog": "prophet_uptc_sog.pkl",
-            "prophet_chi": "prophet_uptc_chi.pkl",
-            "xgb_agua": "xgb_agua.pkl",
-            "xgb_energia": "xgb_energia.pkl",
-            "xgb_ocupacion": "xgb_ocupacion.pkl"
-        }
+        entry = self._loaded.get(model_key)
+        if entry is not None:
+            return entry[0]
 
-        with self._lock:
-            if model_key in self.models:
-                return self.models[model_key]
+        # Lock de carga propio: cargar un modelo no bloquea la inferencia de los demás
+        with self._load_lock:
+            entry = self._loaded.get(model_key)
+            if entry is not None:
+                return entry[0]
             
-            filename = model_files.get(model_key)
+            filename = self.MODEL_FILES.get(model_key)
             if not filename:
                 return None
                 
-            full_path = os.path.join(self.models_path, filename)
-            if os.path.exists(full_path):
+            # Formato nativo (.ubj/.json) si existe y está al día; si no, el .pkl
+            full_path = resolve_artifact(self.models_path, filename)
+            if full_path is not None:
                 try:
-                    logger.info(f"Cargando modelo bajo demanda: {filename}...")
-                    self.models[model_key] = joblib.load(full_path)
-                    return self.models[model_key]
+                    logger.info(f"Cargando modelo bajo demanda: {full_path.name}...")
+                    version = self._artifact_version(full_path)
+                    model = self._prepare_model(load_artifact(full_path))
+                    self._swap_model(model_key, model, version)
+                    return model
                 except Exception as e:
-                    logger.error(f"Error cargando {filename}: {e}")
+                    logger.error(f"Error cargando {full_path.name}: {e}")
             return None
 
-    def _get_cache_key(self, campus_code: str, days: int) -> str:
-        """Genera clave única para el caché."""
-        return f"{campus_code}_{days}_{datetime.now().strftime('%Y%m%d%H')}"
+    def _prepare_model(self, model):
+        if hasattr(model, "get_booster"):
+            # Hilos por booster: los tres objetivos se reparten los núcleos
+            model.set_params(n_jobs=self._xgb_nthread)
+        return model
+
+    def _swap_model(self, model_key: str, model, version: str) -> None:
+        """
+        Publica el par (modelo, versión) en un único dict nuevo: quien lee ve los dos
+        de la misma publicación, y las peticiones en curso terminan con la referencia
+        anterior. Cargas bajo demanda y recargas se serializan aquí para que ninguna
+        pise la publicación de la otra. Dentro de un proceso la clave de caché se
+        calcula antes de pedir el modelo, así que un resultado nunca sale de un modelo
+        más viejo que su clave; con el pool de inferencia el padre guarda los marcos
+        con la versión que le devuelve el worker (ver _aforecast_superset).
+        """
+        with self._swap_lock:
+            self._loaded = {**self._loaded, model_key: (model, version)}
 
-    def _is_cache_valid(self, cache_key: str) -> bool:
-        """Verifica si el caché sigue siendo válido."""
-        if cache_key not in self._prediction_cache:
-            return False
-        cached = self._prediction_cache[cache_key]
-        if datetime.now() - cached['timestamp'] > timedelta(minutes=self._cache_ttl_minutes):
-            del self._prediction_cache[cache_key]
-            return False
-        return True
+    def _smoke_test(self, model_key: str, model) -> None:
+        """Predicción de prueba sobre un nuevo artefacto; lanza ValueError si no es válido."""
+        if model_key in self.PROPHET_MODELS.values():
+            ds = pd.date_range(datetime.now().date(), periods=3, freq='D')
+            preds = model.predict(pd.DataFrame({'ds': ds}))['yhat'].to_numpy()
+        else:
+            resource_type = next(r for k, r, _ in self.XGB_MODELS_CONFIG if k == model_key)
+            X = self.build_xgb_feature_matrix("tun", [{}], [resource_type])[0]
+            preds = np.asarray(model.predict(X))
+        if preds.size == 0 or not np.all(np.isfinite(preds)):
+            raise ValueError(f"predicción de prueba inválida: {preds}")
 
-    def predict_campus_consumption(self, campus_code: str, days: int = 7, start_date: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    def reload_models(self) -> Dict[str, str]:
         """
-        Realiza inferencia sobre un rango de fechas usando Prophet.
-        Si start_date es pasado, hace 'back-casting' (lo que el modelo dice que pasó).
+        Recarga en caliente los modelos cuyo artefacto cambió en disco.
+        Cada uno se carga y valida fuera de los locks de inferencia y se publica
+        solo si pasa la predicción de prueba; si falla se conserva la versión anterior.
+        Las claves de caché llevan la versión, así que las entradas viejas dejan de usarse solas.
         """
-        # 1. Verificar caché
-        cache_key = f"{campus_code}_{days}_{start_date.strftime('%Y%m%d') if start_date else 'now'}"
-        if self._is_cache_valid(cache_key):
-            return self._prediction_cache[cache_key]['data']
+        with self._reload_lock:
+            status: Dict[str, str] = {}
+            for model_key, filename in self.MODEL_FILES.items():
+                artifact = resolve_artifact(self.models_path, filename)
+                if artifact is None:
+                    status[model_key] = "missing"
+                    continue
+                version = self._artifact_version(artifact)
+                entry = self._loaded.get(model_key)
+                if entry is None:
+                    status[model_key] = "lazy"  # Se cargará la versión del disco al usarse
+                    continue
+                if version == entry[1]:
+                    status[model_key] = "unchanged"
+                    continue
+                if version == self._rejected_versions.get(model_key):
+                    status[model_key] = "rejected"
+                    continue
+                try:
+                    candidate = self._prepare_model(load_artifact(artifact))
+                    self._smoke_test(model_key, candidate)
+                except Exception as e:
+                    logger.error(f"Recarga de {model_key} descartada ({artifact.name}): {e}")
+                    self._rejected_versions[model_key] = version
+                    status[model_key] = "rejected"
+                    continue
+                self._swap_model(model_key, candidate, version)
+                self.model_status = {**self.model_status, model_key: "loaded"}
+                logger.info(f"Modelo {model_key} recargado: versión {version}")
+                status[model_key] = "reloaded"
+            return status
 
-        # Mapear código de sede al modelo Prophet correspondiente
-        prophet_map = {
-            "tun": "prophet_tun",
-            "dui": "prophet_dui",
-            "sog": "prophet_sog",
-            "chi": "prophet_chi"
+    def start_model_watcher(self, interval_seconds: float) -> None:
+        """Hilo en segundo plano que revisa ml_models/ cada `interval_seconds` y recarga lo que cambie."""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        import threading
+        self._watcher_stop.clear()
+
+        def watch() -> None:
+            while not self._watcher_stop.wait(interval_seconds):
+                try:
+                    self.reload_models()
+                except Exception as e:
+                    logger.error(f"Error revisando modelos: {e}")
+
+        self._watcher = threading.Thread(target=watch, name="model-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_model_watcher(self) -> None:
+        self._watcher_stop.set()
+
+    @staticmethod
+    def _artifact_version(full_path) -> str:
+        """Versión del artefacto en disco (mtime + tamaño): cambia al reemplazar el archivo."""
+        stat = os.stat(full_path)
+        return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+    def get_model_version(self, model_key: str) -> Optional[str]:
+        """
+        Versión del modelo: la del artefacto ya cargado o, si aún no se ha cargado,
+        la del archivo en disco (sin deserializarlo).
+        """
+        entry = self._loaded.get(model_key)
+        if entry is not None:
+            return entry[1]
+        filename = self.MODEL_FILES.get(model_key)
+        full_path = resolve_artifact(self.models_path, filename) if filename else None
+        if full_path is not None:
+            return self._artifact_version(full_path)
+        return None
+
+    def _get_fast_prophet(self, model_key: str) -> Optional[CompiledProphet]:
+        """
+        Parámetros de la vía rápida (una vez por versión): los precompilados en
+        `<modelo>.fast/` (mapeados en memoria) si están al día; si no, compila el
+        modelo y valida su exactitud contra model.predict. None si no es apto.
+        """
+        version = self.get_model_version(model_key)
+        cached = self._fast_prophet.get(model_key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        filename = self.MODEL_FILES[model_key]
+        artifact = resolve_artifact(self.models_path, filename)
+        directory = compiled_path(self.models_path, filename)
+        if artifact is not None and compiled_is_current(directory, artifact):
+            try:
+                compiled = load_compiled_prophet(directory)
+                self._fast_prophet[model_key] = (version, compiled)
+                return compiled
+            except Exception as e:
+                logger.error(f"No se pudo leer {directory}: {e}")
+
+        model = self._get_model(model_key)
+        if model is None:
+            return None
+        compiled = None
+        try:
+            with self._lock:
+                compiled = compile_prophet(model)
+                if compiled is not None:
+                    today = pd.Timestamp(datetime.now().date())
+                    probe = pd.date_range(today - pd.Timedelta(days=30), periods=60, freq='D').to_numpy()
+                    accuracy = check_accuracy(model, compiled, probe)
+                    if accuracy["max_rel_error"] > self._prophet_fast_tolerance:
+                        logger.warning(f"Prophet rápido descartado para {model_key}: {accuracy}")
+                        compiled = None
+        except Exception as e:
+            logger.error(f"No se pudo compilar {model_key} para la vía rápida: {e}")
+            compiled = None
+        self._fast_prophet[model_key] = (version, compiled)
+        return compiled
+
+    def _prophet_forecast(self, model_key: str, ds: np.ndarray) -> Optional[Dict[str, np.ndarray]]:
+        """
+        yhat, bandas y trend para un vector de fechas (vía rápida si está activa).
+        El modelo Prophet completo solo se deserializa si la vía rápida no aplica.
+        None si no hay modelo.
+        """
+        if self._prophet_fast_mode:
+            compiled = self._get_fast_prophet(model_key)
+            if compiled is not None:
+                result = fast_predict(compiled, ds)
+                if result is not None:
+                    return result
+
+        model = self._get_model(model_key)
+        if not model:
+            return None
+
+        # Bloquear la inferencia para que Windows no colapse con hilos de C++
+        with self._lock:
+            forecast = model.predict(pd.DataFrame({'ds': ds}))
+        return {
+            "yhat": forecast['yhat'].to_numpy(),
+            "yhat_lower": forecast['yhat_lower'].to_numpy(),
+            "yhat_upper": forecast['yhat_upper'].to_numpy(),
+            "trend": forecast['trend'].to_numpy(),
         }
-        model_key = prophet_map.get(campus_code, "prophet_tun")
-        
+
+    def _get_or_compute(self, cache_key: str, compute, ttl_seconds: Optional[float] = None) -> Any:
+        """
+        Valor del caché o, si falta, lo calcula una sola vez aunque lleguen varias
+        peticiones iguales a la vez (single-flight): las demás esperan al mismo cálculo.
+        Los resultados None (modelo ausente) no se guardan.
+        """
+        value = self._prediction_cache.get(cache_key)
+        if value is not None:
+            return value
+
+        def leader() -> Any:
+            # Otro líder pudo llenar el caché entre nuestro miss y este turno
+            if cache_key in self._prediction_cache:
+                cached = self._prediction_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            result = compute()
+            if result is not None:
+                self._prediction_cache.set(cache_key, result, ttl_seconds=ttl_seconds)
+            return result
+
+        return self._single_flight.do(cache_key, leader)
+
+    def _get_forecast_superset(self, model_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Pronóstico diario amplio (hoy - past .. hoy + future) de una sede.
+        Se calcula una vez por versión de modelo y día; las ventanas se recortan de aquí.
+        """
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        cache_key = f"{model_key}@{self.get_model_version(model_key)}:superset_{today.strftime('%Y%m%d')}"
+        start = today - timedelta(days=self._superset_past_days)
+
+        def compute() -> Optional[Dict[str, Any]]:
+            ds = pd.date_range(start, periods=self._superset_past_days + self._superset_future_days + 1, freq='D').to_numpy()
+            forecast = self._prophet_forecast(model_key, ds)
+            return {"start": start, **forecast} if forecast is not None else None
+
+        # Vigente hasta medianoche: al día siguiente se recalcula centrado en la nueva fecha
+        seconds_left = (today + timedelta(days=1) - datetime.now()).total_seconds()
+        return self._get_or_compute(cache_key, compute, ttl_seconds=max(seconds_left, 1.0))
+
+    def _in_superset(self, base_date: datetime, days: int) -> bool:
+        """Si la ventana cae dentro del marco diario precalculado."""
+        offset_from_today = (base_date.date() - datetime.now().date()).days
+        return -self._superset_past_days <= offset_from_today and offset_from_today + days <= self._superset_future_days + 1
+
+    def forecast_superset(self, model_key: str) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+        """
+        Marco diario amplio de un modelo Prophet (el proceso padre lo recorta por
+        ventana) junto con la versión del modelo que lo produjo. La versión se lee
+        antes de calcular: el marco sale de esa versión o de una posterior.
+        """
+        version = self.get_model_version(model_key)
+        return version, self._get_forecast_superset(model_key)
+
+    def _forecast_samples(self, model_key: str, base_date: datetime, days: int) -> Optional[np.ndarray]:
+        """
+        Muestras posteriores de yhat (days, muestras) en float32 para la ventana.
+        Dentro del marco precalculado se recortan de las muestras del marco completo
+        (un solo muestreo por versión de modelo y día); fuera, se cachean por ventana.
+        """
+        version = self.get_model_version(model_key)
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        offset = (base_date.date() - today.date()).days + self._superset_past_days
+        total = self._superset_past_days + self._superset_future_days + 1
+
+        if offset >= 0 and offset + days <= total:
+            start = today - timedelta(days=self._superset_past_days)
+            seconds_left = (today + timedelta(days=1) - datetime.now()).total_seconds()
+            samples = self._get_or_compute(
+                f"{model_key}@{version}:samples_{today.strftime('%Y%m%d')}",
+                lambda: self._prophet_samples(model_key, pd.date_range(start, periods=total, freq='D').to_numpy()),
+                ttl_seconds=max(seconds_left, 1.0),
+            )
+            return None if samples is None else samples[offset:offset + days]
+
+        window = base_date.strftime('%Y%m%d')
+        return self._get_or_compute(
+            f"{model_key}@{version}:samples_{days}_{window}",
+            lambda: self._prophet_samples(model_key, pd.date_range(base_date.date(), periods=days, freq='D').to_numpy()),
+        )
+
+    def _prophet_samples(self, model_key: str, ds: np.ndarray) -> Optional[np.ndarray]:
+        """Muestras de la distribución predictiva de Prophet (un muestreo propio, no el de model.predict)."""
         model = self._get_model(model_key)
         if not model:
             return None
+        with self._lock:
+            samples = model.predictive_samples(pd.DataFrame({'ds': ds}))['yhat']
+        return np.ascontiguousarray(samples, dtype=np.float32)
+
+    def _slice_forecast_superset(self, frame: Dict[str, Any], base_date: datetime, days: int) -> Optional[Dict[str, Any]]:
+        """Recorta `days` días desde `base_date`; None si la ventana se sale del marco."""
+        offset = (base_date.date() - frame["start"].date()).days
+        if offset < 0 or offset + days > len(frame["yhat"]):
+            return None
+        window = slice(offset, offset + days)
+        return {
+            "dates": [(base_date + timedelta(days=x)).strftime('%Y-%m-%d') for x in range(days)],
+            "predictions": np.round(frame["yhat"][window], 2).tolist(),
+            "lower_bound": np.round(frame["yhat_lower"][window], 2).tolist(),
+            "upper_bound": np.round(frame["yhat_upper"][window], 2).tolist(),
+            "trend": np.round(frame["trend"][window], 2).tolist()
+        }
 
+    def predict_campus_consumption(
+        self,
+        campus_code: str,
+        days: int = 7,
+        start_date: Optional[datetime] = None,
+        quantiles: Optional[List[float]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Realiza inferencia sobre un rango de fechas usando Prophet.
+        Si start_date es pasado, hace 'back-casting' (lo que el modelo dice que pasó).
+        Las ventanas dentro del marco diario precalculado se responden recortándolo,
+        sin volver a ejecutar Prophet.
+        Con `quantiles` (p. ej. [0.1, 0.5, 0.9]) añade "quantiles": {"0.1": [...], ...},
+        calculados sobre las muestras posteriores por día guardadas en caché. En ese
+        caso lower_bound/upper_bound también salen de esas muestras (al
+        interval_width del modelo), así coinciden con los cuantiles equivalentes;
+        sin `quantiles` las bandas son las de model.predict o, en la vía rápida,
+        las de los residuos del ajuste.
+        """
+        if quantiles is not None:
+            quantiles = [float(q) for q in quantiles]
+            if not quantiles or any(not 0.0 <= q <= 1.0 for q in quantiles):
+                raise ValueError("Los cuantiles deben estar entre 0 y 1")
+
+        result = self._predict_daily(campus_code, days, start_date)
+        if result is None or not quantiles:
+            return result
+
+        model_key = self.PROPHET_MODELS.get(campus_code, "prophet_tun")
         try:
-            # Bloquear la inferencia para que Windows no colapse con hilos de C++
-            with self._lock:
-                # Crear un DataFrame de fechas personalizado (puede ser pasado o futuro)
-                base_date = start_date or datetime.now()
-                date_list = [base_date + timedelta(days=x) for x in range(days)]
-                future = pd.DataFrame({'ds': date_list})
-                
-                forecast = model.predict(future)
-            
-            result = {
-                "dates": forecast['ds'].dt.strftime('%Y-%m-%d').tolist(),
-                "predictions": [round(v, 2) for v in forecast['yhat'].tolist()],
-                "lower_bound": [round(v, 2) for v in forecast['yhat_lower'].tolist()],
-                "upper_bound": [round(v, 2) for v in forecast['yhat_upper'].tolist()],
-                "trend": [round(v, 2) for v in forecast['trend'].tolist()]
-            }
-            
-            self._prediction_cache[cache_key] = {'data': result, 'timestamp': datetime.now()}
+            samples = self._forecast_samples(model_key, start_date or datetime.now(), days)
+        except Exception as e:
+            logger.error(f"Error muestreando Prophet ({campus_code}): {e}")
             return result
-            
+        if samples is None:
+            return result
+        width = float(getattr(self._get_model(model_key), "interval_width", 0.8))
+        levels = np.quantile(samples, quantiles + [(1 - width) / 2, (1 + width) / 2], axis=1)
+        # Copia: `result` puede ser el objeto guardado en caché
+        return {
+            **result,
+            "lower_bound": np.round(levels[-2], 2).tolist(),
+            "upper_bound": np.round(levels[-1], 2).tolist(),
+            "quantiles": {format(q, "g"): np.round(level, 2).tolist() for q, level in zip(quantiles, levels)},
+        }
+
+    def _predict_daily(self, campus_code: str, days: int, start_date: Optional[datetime]) -> Optional[Dict[str, Any]]:
+        """Pronóstico diario (yhat, bandas y trend) de predict_campus_consumption."""
+        # Mapear código de sede al modelo Prophet correspondiente
+        model_key = self.PROPHET_MODELS.get(campus_code, "prophet_tun")
+        base_date = start_date or datetime.now()
+
+        # 0. Ventanas habituales: recorte del marco amplio
+        if self._in_superset(base_date, days):
+            try:
+                frame = self._get_forecast_superset(model_key)
+                if frame is None:
+                    return None
+                result = self._slice_forecast_superset(frame, base_date, days)
+                if result is not None:
+                    return result
+            except Exception as e:
+                logger.error(f"Error en inferencia Prophet ({campus_code}): {e}")
+                return None
+
+        # 1. Ventanas fuera del marco: caché por ventana (clave versionada por artefacto) + inferencia directa
+        window = start_date.strftime('%Y%m%d') if start_date else f"now{datetime.now().strftime('%Y%m%d')}"
+        cache_key = f"{model_key}@{self.get_model_version(model_key)}:{campus_code}_{days}_{window}"
+        def compute() -> Optional[Dict[str, Any]]:
+            # Crear un vector de fechas personalizado (puede ser pasado o futuro)
+            date_list = [base_date + timedelta(days=x) for x in range(days)]
+            forecast = self._prophet_forecast(model_key, pd.to_datetime(date_list).to_numpy())
+            if forecast is None:
+                return None
+            return {
+                "dates": [d.strftime('%Y-%m-%d') for d in date_list],
+                "predictions": np.round(forecast['yhat'], 2).tolist(),
+                "lower_bound": np.round(forecast['yhat_lower'], 2).tolist(),
+                "upper_bound": np.round(forecast['yhat_upper'], 2).tolist(),
+                "trend": np.round(forecast['trend'], 2).tolist()
+            }
+
+        try:
+            return self._get_or_compute(cache_key, compute)
         except Exception as e:
             logger.error(f"Error en inferencia Prophet ({campus_code}): {e}")
             return None
 
+    def forecast_chunk(self, campus_code: str, start_date: datetime, days: int) -> Optional[Dict[str, Any]]:
+        """
+        Un tramo del pronóstico diario sin pasar por el caché (exportaciones largas
+        por streaming). Mismo formato que predict_campus_consumption.
+        """
+        model_key = self.PROPHET_MODELS.get(campus_code, "prophet_tun")
+        ds = np.datetime64(start_date.date(), 'D') + np.arange(days)
+        forecast = self._prophet_forecast(model_key, ds.astype('datetime64[ns]'))
+        if forecast is None:
+            return None
+        return {
+            "dates": np.datetime_as_string(ds).tolist(),
+            "predictions": np.round(forecast['yhat'], 2).tolist(),
+            "lower_bound": np.round(forecast['yhat_lower'], 2).tolist(),
+            "upper_bound": np.round(forecast['yhat_upper'], 2).tolist(),
+            "trend": np.round(forecast['trend'], 2).tolist()
+        }
+
     def build_xgb_features(
         self,
         campus_code: str,
@@ -151,12 +597,14 @@ class PredictionService:
         temp_promedio_c: float = 18.0,
         lag_1h: float = 100.0,
         lag_24h: float = 2400.0,
-        es_festivo: bool = False,
-        en_periodo_academico: bool = True
+        es_festivo: Optional[bool] = None,
+        en_periodo_academico: Optional[bool] = None
     ) -> pd.DataFrame:
         """
         Construye un DataFrame con las features específicas.
         Incluye SANITIZACIÓN de inputs para evitar valores físicos imposibles.
+        Día de la semana, mes y, si no se pasan, festivo y periodo académico
+        salen del índice de calendario para hoy.
         """
         # Sanitización (Edge Case Protection)
         hora = max(0, min(23, hora))
@@ -166,115 +614,620 @@ class PredictionService:
         lag_1h = max(0.0, lag_1h)
         lag_24h = max(0.0, lag_24h)
         
-        now = datetime.now()
-        
+        calendar = self._calendar_today(campus_code)
+        if es_festivo is None:
+            es_festivo = bool(calendar["is_holiday"][0])
+        if en_periodo_academico is None:
+            en_periodo_academico = bool(calendar["is_academic"][0])
+
         # Features comunes
         base_features = {
             'hora': hora,
-            'dia_numero': now.weekday(),
-            'es_fin_semana': 1 if now.weekday() >= 5 else 0,
+            'dia_numero': int(calendar["weekday"][0]),
+            'es_fin_semana': int(calendar["is_weekend"][0]),
             'sede_code': self.SEDE_CODES.get(campus_code, 3),
             'es_festivo': 1 if es_festivo else 0,
             'en_periodo_academico': 1 if en_periodo_academico else 0,
-            'mes': now.month,
+            'mes': int(calendar["month"][0]),
             'temp_promedio_c': temp_promedio_c,
             'num_estudiantes': num_estudiantes,
             'num_edificios': num_edificios,
             'area_m2': area_m2
         }
 
-        # Features específicas según recurso
-        if resource_type == "agua":
-            base_features['agua_litros_lag_1h'] = lag_1h
-            base_features['agua_litros_lag_24h'] = lag_24h
-            feature_order = [
-                'hora', 'dia_numero', 'es_fin_semana', 'sede_code', 'es_festivo', 
-                'en_periodo_academico', 'mes', 'temp_promedio_c', 'num_estudiantes', 
-                'num_edificios', 'area_m2', 'agua_litros_lag_1h', 'agua_litros_lag_24h'
-            ]
-        else: # energia u ocupacion (asumimos que usan lags de energia por defecto o similar)
-            base_features['energia_total_kwh_lag_1h'] = lag_1h
-            base_features['energia_total_kwh_lag_24h'] = lag_24h
-            feature_order = [
-                'hora', 'dia_numero', 'es_fin_semana', 'sede_code', 'es_festivo', 
-                'en_periodo_academico', 'mes', 'temp_promedio_c', 'num_estudiantes', 
-                'num_edificios', 'area_m2', 'energia_total_kwh_lag_1h', 'energia_total_kwh_lag_24h'
-            ]
-        
-        # Features específicas según recurso
-        if resource_type == "agua":
-            base_features['agua_litros_lag_1h'] = lag_1h
-            base_features['agua_litros_lag_24h'] = lag_24h
-            feature_order = [
-                'hora', 'dia_numero', 'es_fin_semana', 'sede_code', 'es_festivo', 
-                'en_periodo_academico', 'mes', 'temp_promedio_c', 'num_estudiantes', 
-                'num_edificios', 'area_m2', 'agua_litros_lag_1h', 'agua_litros_lag_24h'
-            ]
-        elif resource_type == "ocupacion":
-            base_features['ocupacion_pct_lag_1h'] = lag_1h / 100.0 # Asumiendo entrada bruta, ajustar si es pct
-            base_features['ocupacion_pct_lag_24h'] = lag_24h / 100.0
-            feature_order = [
-                'hora', 'dia_numero', 'es_fin_semana', 'sede_code', 'es_festivo', 
-                'en_periodo_academico', 'mes', 'temp_promedio_c', 'num_estudiantes', 
-                'num_edificios', 'area_m2', 'ocupacion_pct_lag_1h', 'ocupacion_pct_lag_24h'
-            ]
-        else: # energia
-            base_features['energia_total_kwh_lag_1h'] = lag_1h
-            base_features['energia_total_kwh_lag_24h'] = lag_24h
-            feature_order = [
-                'hora', 'dia_numero', 'es_fin_semana', 'sede_code', 'es_festivo', 
-                'en_periodo_academico', 'mes', 'temp_promedio_c', 'num_estudiantes', 
-                'num_edificios', 'area_m2', 'energia_total_kwh_lag_1h', 'energia_total_kwh_lag_24h'
-            ]
+        # Features específicas según recurso (ocupación escala el valor bruto a fracción)
+        lag_1h_col, lag_24h_col, lag_scale = self.LAG_FEATURES.get(resource_type, self.LAG_FEATURES['energia'])
+        base_features[lag_1h_col] = lag_1h * lag_scale
+        base_features[lag_24h_col] = lag_24h * lag_scale
+        feature_order = self.xgb_feature_names(resource_type)
         
         return pd.DataFrame([base_features])[feature_order]
 
-    def predict_resource_impact(self, campus_code: str, **kwargs) -> Dict[str, float]:
+    @staticmethod
+    def _calendar_today(campus_code: str) -> Dict[str, np.ndarray]:
+        """Indicadores del índice de calendario para hoy (arrays de un elemento)."""
+        return calendar_index.lookup(np.atleast_1d(np.datetime64(datetime.now().date(), 'D')), campus_code)
+
+    def xgb_feature_names(self, resource_type: str = "energia") -> List[str]:
+        """Orden de columnas del modelo XGBoost de un recurso: comunes + lags propios."""
+        lag_1h_col, lag_24h_col, _ = self.LAG_FEATURES.get(resource_type, self.LAG_FEATURES['energia'])
+        return self.XGB_SHARED_FEATURES + [lag_1h_col, lag_24h_col]
+
+    def build_xgb_feature_matrix(
+        self,
+        campus_code: str,
+        rows: List[Dict[str, Any]],
+        resource_types: List[str]
+    ) -> np.ndarray:
         """
-        Usa los modelos XGBoost para predecir impacto.
+        Matriz de features fusionada para varios modelos: (len(resource_types), n, 13) float32.
+        Las 11 columnas comunes se calculan una sola vez; solo las 2 de lag
+        (escaladas por recurso) difieren entre objetivos. Cada fila acepta las
+        mismas claves que build_xgb_features, con la misma sanitización.
+        """
+        return self.build_xgb_feature_matrix_from_columns(
+            campus_code, len(rows), self._rows_to_columns(rows), resource_types
+        )
+
+    def _rows_to_columns(self, rows: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """Entradas por fila -> columnas (solo las claves presentes en alguna fila)."""
+        for row in rows:
+            unknown = set(row) - set(self.XGB_INPUT_DEFAULTS)
+            if unknown:
+                raise TypeError(f"Features desconocidas: {sorted(unknown)}")
+        present = {name for row in rows for name in row}
+        return {
+            name: np.array([row.get(name, self.XGB_INPUT_DEFAULTS[name]) for row in rows], dtype=float)
+            for name in present
+        }
+
+    def build_xgb_feature_matrix_from_columns(
+        self,
+        campus_code: str,
+        n: int,
+        columns: Dict[str, Any],
+        resource_types: List[str],
+        timestamps: Optional[np.ndarray] = None
+    ) -> np.ndarray:
         """
+        Igual que build_xgb_feature_matrix pero con entradas columnares: cada
+        valor de `columns` es un array de n elementos o un escalar; las entradas
+        ausentes toman XGB_INPUT_DEFAULTS. El día de la semana, el mes y, si no se
+        pasan (o son NaN), es_festivo y en_periodo_academico salen del índice de
+        calendario: por fila con `timestamps` (datetime64, uno por fila), o de hoy.
+        """
+        unknown = set(columns) - set(self.XGB_INPUT_DEFAULTS)
+        if unknown:
+            raise TypeError(f"Features desconocidas: {sorted(unknown)}")
+
+        def column(name: str) -> np.ndarray:
+            return np.asarray(columns.get(name, self.XGB_INPUT_DEFAULTS[name]), dtype=float)
+
+        if timestamps is None:
+            calendar = self._calendar_today(campus_code)
+        else:
+            calendar = calendar_index.lookup(timestamps, campus_code)
+        weekday, month = calendar["weekday"], calendar["month"]
+
+        def flag(name: str, from_calendar: np.ndarray) -> np.ndarray:
+            values = column(name)
+            return np.where(np.isnan(values), from_calendar, values).astype(bool)
+
+        shared = len(self.XGB_SHARED_FEATURES)
+        matrix = np.empty((len(resource_types), n, shared + 2), dtype=np.float32)
+
+        # Columnas comunes: se escriben en la primera capa y se replican al resto
+        common = matrix[0]
+        common[:, 0] = np.trunc(np.clip(column('hora'), 0, 23))       # hora
+        common[:, 1] = weekday                                        # dia_numero
+        common[:, 2] = np.asarray(weekday) >= 5                       # es_fin_semana
+        common[:, 3] = self.SEDE_CODES.get(campus_code, 3)            # sede_code
+        common[:, 4] = flag('es_festivo', calendar["is_holiday"])     # es_festivo
+        common[:, 5] = flag('en_periodo_academico', calendar["is_academic"])
+        common[:, 6] = month                                          # mes
+        common[:, 7] = column('temp_promedio_c')
+        common[:, 8] = np.maximum(column('num_estudiantes'), 0)
+        common[:, 9] = np.maximum(column('num_edificios'), 1)
+        common[:, 10] = np.maximum(column('area_m2'), 10.0)
+        matrix[1:, :, :shared] = common[:, :shared]
+
+        # Lags brutos una vez; cada objetivo aplica su escala
+        lag_1h = np.maximum(column('lag_1h'), 0.0)
+        lag_24h = np.maximum(column('lag_24h'), 0.0)
+        for i, resource_type in enumerate(resource_types):
+            _, _, lag_scale = self.LAG_FEATURES.get(resource_type, self.LAG_FEATURES['energia'])
+            matrix[i, :, shared] = lag_1h * lag_scale
+            matrix[i, :, shared + 1] = lag_24h * lag_scale
+        return matrix
+
+    def build_xgb_features_batch(
+        self,
+        campus_code: str,
+        rows: List[Dict[str, Any]],
+        resource_type: str = "energia"
+    ) -> pd.DataFrame:
+        """
+        Versión vectorizada de build_xgb_features: una fila por elemento de `rows`
+        (DataFrame con nombres de columna; la ruta de inferencia usa la matriz fusionada).
+        """
+        matrix = self.build_xgb_feature_matrix(campus_code, rows, [resource_type])[0]
+        return pd.DataFrame(matrix, columns=self.xgb_feature_names(resource_type))
+
+    def _get_fast_xgb(self, model_key: str, model, resource_type: str) -> Optional[xgb_fast.CompiledEnsemble]:
+        """
+        Aplana (una vez por versión) los árboles del booster y valida el evaluador
+        contra model.predict sobre una rejilla de filas de prueba. None si no es apto.
+        """
+        version = self.get_model_version(model_key)
+        cached = self._fast_xgb.get(model_key)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+
+        compiled = None
+        try:
+            with self._lock:
+                compiled = xgb_fast.compile_booster(model)
+                if compiled is not None:
+                    probe = self.build_xgb_features_batch("tun", [
+                        {"hora": h, "temp_promedio_c": t, "area_m2": a, "lag_1h": a / 100.0}
+                        for h in range(0, 24, 3) for t in (8.0, 18.0, 28.0) for a in (500.0, 15000.0, 60000.0)
+                    ], resource_type=resource_type)
+                    if compiled.feature_names and compiled.feature_names != list(probe.columns):
+                        compiled = None
+                    else:
+                        accuracy = xgb_fast.check_accuracy(model, compiled, probe)
+                        if accuracy["max_rel_error"] > self._xgb_fast_tolerance:
+                            logger.warning(f"XGBoost rápido descartado para {model_key}: {accuracy}")
+                            compiled = None
+        except Exception as e:
+            logger.error(f"No se pudo compilar {model_key} para la vía rápida: {e}")
+            compiled = None
+        self._fast_xgb[model_key] = (version, compiled)
+        return compiled
+
+    def _predict_xgb(self, model_key: str, model, X: np.ndarray, resource_type: str = "energia") -> np.ndarray:
+        """
+        Inferencia XGBoost sobre una matriz float32 (una llamada por lote).
+        Con xgb_fast_mode, usa el evaluador de árboles compilado si el modelo es apto.
+        """
+        if self._xgb_fast_mode and len(X) <= self.XGB_FAST_MAX_ROWS:
+            compiled = self._get_fast_xgb(model_key, model, resource_type)
+            if compiled is not None:
+                return xgb_fast.fast_predict(compiled, X)
+
         import xgboost as xgb
-        results = {}
-        
-        # Mapeo de modelos y sus tipos de recurso
-        models_config = [
-            ("xgb_energia", "energia", "energy_prediction"),
-            ("xgb_agua", "agua", "water_prediction"),
-            ("xgb_ocupacion", "ocupacion", "occupancy_prediction")
-        ]
-        
+        # Un lock por modelo: el mismo booster no se usa desde dos hilos, pero los tres objetivos sí corren a la vez
+        with self._model_locks[model_key]:
+            try:
+                # Intento 1: Directo (ndarray, sin el coste de convertir un DataFrame)
+                return np.asarray(model.predict(X))
+            except Exception:
+                # Intento 2: DMatrix con nombres explícitos
+                dtest = xgb.DMatrix(X, feature_names=self.xgb_feature_names(resource_type))
+                return np.asarray(model.get_booster().predict(dtest))
+
+    def predict_xgb_frame(self, model_key: str, df: pd.DataFrame) -> Optional[np.ndarray]:
+        """Predicción de un modelo XGBoost sobre features ya construidas (None si no hay modelo)."""
+        model = self._get_model(model_key)
+        if not model:
+            return None
+        resource_type = next((r for k, r, _ in self.XGB_MODELS_CONFIG if k == model_key), "energia")
+        return self._predict_xgb(model_key, model, df.to_numpy(dtype=np.float32), resource_type=resource_type)
+
+    def _predict_resource_arrays(self, campus_code: str, rows: List[Dict[str, Any]]) -> Dict[str, np.ndarray]:
+        """Predicciones sin redondear por clave de resultado (solo modelos disponibles)."""
+        return self._predict_resource_columns(campus_code, len(rows), self._rows_to_columns(rows))
+
+    def _predict_resource_columns(self, campus_code: str, n: int, columns: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """Como _predict_resource_arrays, con entradas columnares de n filas."""
+        loaded = [(key, resource_type, result_key, self._get_model(key))
+                  for key, resource_type, result_key in self.XGB_MODELS_CONFIG]
+        loaded = [entry for entry in loaded if entry[3]]
+        if not loaded or not n:
+            return {}
+
+        # Features comunes una sola vez; solo las columnas de lag cambian por modelo
+        matrix = self.build_xgb_feature_matrix_from_columns(campus_code, n, columns, [entry[1] for entry in loaded])
+
+        def run(i: int) -> np.ndarray:
+            key, resource_type, _, model = loaded[i]
+            return self._predict_xgb(key, model, matrix[i], resource_type=resource_type)
+
+        if n >= self.XGB_PARALLEL_MIN_ROWS and len(loaded) > 1:
+            all_preds = list(self._xgb_threads().map(run, range(len(loaded))))
+        else:
+            all_preds = [run(i) for i in range(len(loaded))]
+        return {result_key: preds for (_, _, result_key, _), preds in zip(loaded, all_preds)}
+
+    @staticmethod
+    def _to_results(n: int, arrays: Dict[str, np.ndarray]) -> List[Dict[str, float]]:
+        results: List[Dict[str, float]] = [{} for _ in range(n)]
+        for result_key, preds in arrays.items():
+            for result, pred in zip(results, np.round(np.asarray(preds, dtype=float), 2).tolist()):
+                result[result_key] = pred
+        return results
+
+    def predict_resource_impact_batch(self, campus_code: str, rows: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """
+        Predice el impacto de N unidades (u horas) con una sola inferencia por modelo.
+        Devuelve una lista de resultados en el mismo orden que `rows`.
+        """
         try:
-            for model_key, resource_type, result_key in models_config:
-                model = self._get_model(model_key)
-                if model:
-                    # Construir features ESPECÍFICAS para este modelo
-                    df = self.build_xgb_features(
-                        campus_code, 
-                        resource_type=resource_type,
-                        **kwargs
-                    )
-                    
-                    try:
-                        # Bloquear inferencia XGBoost
-                        with self._lock:
-                            # Intento 1: Directo
-                            pred = model.predict(df)
-                    except Exception:
-                        with self._lock:
-                            # Intento 2: DMatrix con nombres explícitos
-                            feature_names = df.columns.tolist()
-                            dtest = xgb.DMatrix(df.values, feature_names=feature_names)
-                            booster = model.get_booster()
-                            pred = booster.predict(dtest)
-                    
-                    results[result_key] = round(float(pred[0]), 2)
-                
+            return self._to_results(len(rows), self._predict_resource_arrays(campus_code, rows))
         except Exception as e:
             logger.error(f"Error CRÍTICO en predicción XGBoost: {e}")
-            raise e 
-            
+            raise e
+
+    def _get_impact_grid(self, campus_code: str) -> Dict[str, np.ndarray]:
+        """
+        Tabla precalculada de una sede: (festivo, periodo académico, hora, bucket de área)
+        por clave de resultado, con el resto de entradas en XGB_INPUT_DEFAULTS.
+        Se construye con un solo lote y se invalida al cambiar la versión de algún
+        modelo o el día (dia_numero, es_fin_semana y mes salen de la fecha).
+        """
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        versions = "+".join(str(self.get_model_version(key)) for key, _, _ in self.XGB_MODELS_CONFIG)
+        cache_key = f"impact_grid@{versions}:{campus_code}_{today.strftime('%Y%m%d')}"
+        areas = self.IMPACT_GRID_AREAS
+
+        def compute() -> Dict[str, np.ndarray]:
+            rows = [
+                {"es_festivo": festivo, "en_periodo_academico": academico, "hora": hora, "area_m2": float(area)}
+                for festivo in (False, True) for academico in (False, True)
+                for hora in range(24) for area in areas
+            ]
+            arrays = self._predict_resource_arrays(campus_code, rows)
+            return {key: preds.astype(np.float32).reshape(2, 2, 24, len(areas)) for key, preds in arrays.items()}
+
+        seconds_left = (today + timedelta(days=1) - datetime.now()).total_seconds()
+        return self._get_or_compute(cache_key, compute, ttl_seconds=max(seconds_left, 1.0))
+
+    def predict_resource_impact_grid(self, campus_code: str, rows: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """
+        Como predict_resource_impact_batch, pero leyendo la tabla precalculada de la sede
+        e interpolando linealmente en log(área) entre buckets. Las filas con otras
+        entradas (temperatura, lags...) o un área fuera de la tabla van al modelo.
+        """
+        if not rows:
+            return []
+        grid_rows = [not (set(row) - self.IMPACT_GRID_INPUTS) for row in rows]
+        area = np.maximum(np.array([row.get("area_m2", self.XGB_INPUT_DEFAULTS["area_m2"]) for row in rows], dtype=float), 10.0)
+        in_grid = np.array(grid_rows) & (area <= self.IMPACT_GRID_AREAS[-1])
+
+        results: List[Dict[str, float]] = [{} for _ in rows]
+        idx = np.flatnonzero(in_grid)
+        if len(idx):
+            grid = self._get_impact_grid(campus_code)
+            picked = [rows[i] for i in idx]
+            hora = np.trunc(np.clip([row.get("hora", self.XGB_INPUT_DEFAULTS["hora"]) for row in picked], 0, 23)).astype(int)
+            today = self._calendar_today(campus_code)
+            festivo = np.array([bool(row.get("es_festivo", today["is_holiday"][0])) for row in picked], dtype=int)
+            academico = np.array([bool(row.get("en_periodo_academico", today["is_academic"][0])) for row in picked], dtype=int)
+
+            position = np.interp(np.log(area[idx]), np.log(self.IMPACT_GRID_AREAS), np.arange(len(self.IMPACT_GRID_AREAS)))
+            lower = np.minimum(position.astype(int), len(self.IMPACT_GRID_AREAS) - 2)
+            weight = position - lower
+            arrays = {
+                key: table[festivo, academico, hora, lower] * (1 - weight) + table[festivo, academico, hora, lower + 1] * weight
+                for key, table in grid.items()
+            }
+            for i, result in zip(idx, self._to_results(len(idx), arrays)):
+                results[i] = result
+
+        rest = np.flatnonzero(~in_grid)
+        if len(rest):
+            for i, result in zip(rest, self.predict_resource_impact_batch(campus_code, [rows[i] for i in rest])):
+                results[i] = result
         return results
 
+    def predict_hourly_consumption(
+        self,
+        campus_code: str,
+        days: int = 7,
+        start_date: Optional[datetime] = None,
+        sector: Optional[str] = None,
+        inputs: Optional[Dict[str, Any]] = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Pronóstico horario (días × 24): nivel diario de Prophet repartido según
+        una forma horaria. La forma sale de XGBoost de energía evaluado en lote
+        sobre las marcas horarias reales (día de la semana y mes de cada día);
+        con `sector`, o sin modelo XGBoost, se usa el perfil de HOURLY_PROFILES.
+        Cada día suma su nivel diario.
+        """
+        daily = self.predict_campus_consumption(campus_code, days=days, start_date=start_date)
+        if daily is None:
+            return None
+
+        level = np.asarray(daily["predictions"], dtype=float)
+        day0 = np.datetime64(daily["dates"][0], 'D')
+        timestamps = (day0 + np.arange(len(level)))[:, None].astype('datetime64[h]') + np.arange(24)
+
+        shape, source = self._hourly_shape(campus_code, timestamps.ravel(), sector, inputs)
+        values = level[:, None] * shape
+        return {
+            "timestamps": np.datetime_as_string(timestamps.ravel(), unit='m').tolist(),
+            "hours": np.tile(np.arange(24), len(level)).tolist(),
+            "values": np.round(values.ravel(), 2).tolist(),
+            "daily": daily["predictions"],
+            "shape_source": source,
+        }
+
+    def _hourly_shape(
+        self,
+        campus_code: str,
+        timestamps: np.ndarray,
+        sector: Optional[str],
+        inputs: Optional[Dict[str, Any]]
+    ) -> Tuple[np.ndarray, str]:
+        """Reparto horario (días, 24) con filas que suman 1, y su origen ('xgb' o 'profile')."""
+        n_days = len(timestamps) // 24
+        profile = np.asarray(HOURLY_PROFILES.get(sector or "general", HOURLY_PROFILES["general"]), dtype=float)
+        fallback = np.broadcast_to(profile / profile.sum(), (n_days, 24))
+
+        model = None if sector else self._get_model("xgb_energia")
+        if not model:
+            return fallback, "profile"
+
+        columns = {**(inputs or {}), "hora": np.tile(np.arange(24), n_days)}
+        matrix = self.build_xgb_feature_matrix_from_columns(
+            campus_code, len(timestamps), columns, ["energia"], timestamps=timestamps
+        )
+        preds = self._predict_xgb("xgb_energia", model, matrix[0], resource_type="energia")
+        curve = np.clip(np.asarray(preds, dtype=float).reshape(n_days, 24), 0.0, None)
+        totals = curve.sum(axis=1, keepdims=True)
+        # Días con curva degenerada (todo <= 0) usan el perfil
+        shape = np.where(totals > 0, curve / np.where(totals > 0, totals, 1.0), fallback)
+        return shape, "xgb"
+
+    def predict_scenario_sweep(
+        self,
+        campus_code: str,
+        axes: Dict[str, List[float]],
+        fixed: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        """
+        Barrido what-if: producto cartesiano de los valores de `axes`
+        (p. ej. temp_promedio_c × num_estudiantes × hora), con el resto de entradas
+        en `fixed` o XGB_INPUT_DEFAULTS. La rejilla completa se arma con NumPy y se
+        evalúa en una sola pasada por modelo. Devuelve, por clave de resultado, una
+        superficie anidada con un nivel por eje, en el orden de `axes`.
+        """
+        fixed = dict(fixed or {})
+        names = list(axes)
+        unknown = (set(names) | set(fixed)) - set(self.XGB_INPUT_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Features desconocidas: {sorted(unknown)}")
+        if not names:
+            raise ValueError("Se requiere al menos un eje")
+        values = [np.asarray(axes[name], dtype=float).ravel() for name in names]
+        shape = tuple(len(v) for v in values)
+        points = int(np.prod(shape))
+        if points == 0:
+            raise ValueError("Todos los ejes deben tener al menos un valor")
+        if points > self.SCENARIO_MAX_POINTS:
+            raise ValueError(f"El barrido tiene {points} puntos (máximo {self.SCENARIO_MAX_POINTS})")
+
+        grids = np.meshgrid(*values, indexing='ij')
+        columns = {**fixed, **{name: grid.ravel() for name, grid in zip(names, grids)}}
+        arrays = self._predict_resource_columns(campus_code, points, columns)
+        return {
+            "axes": {name: v.tolist() for name, v in zip(names, values)},
+            "shape": list(shape),
+            "points": points,
+            "fixed": fixed,
+            "surfaces": {
+                key: np.round(preds.astype(float), 2).reshape(shape).tolist()
+                for key, preds in arrays.items()
+            },
+        }
+
+    def _xgb_threads(self):
+        """Pool de hilos para ejecutar los boosters de cada objetivo en paralelo (xgboost libera el GIL)."""
+        if self._xgb_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            self._xgb_executor = ThreadPoolExecutor(max_workers=len(self.XGB_MODELS_CONFIG), thread_name_prefix="xgb")
+        return self._xgb_executor
+
+    def predict_resource_impact(self, campus_code: str, **kwargs) -> Dict[str, float]:
+        """
+        Usa los modelos XGBoost para predecir impacto.
+        """
+        return self.predict_resource_impact_batch(campus_code, [kwargs])[0]
+
+    def explain_energy_prediction(self, campus_code: str, **inputs) -> Optional[Dict[str, Any]]:
+        """
+        Predicción de energía de una fila (mismas entradas que build_xgb_features)
+        con su explicación SHAP. None si el modelo no está disponible.
+        """
+        from app.services.xai_service import xai_service
+
+        model = self._get_model("xgb_energia")
+        if not model:
+            return None
+        features_df = self.build_xgb_features(campus_code=campus_code, **inputs)
+        prediction = float(self.predict_xgb_frame("xgb_energia", features_df)[0])
+        return {
+            "prediction": prediction,
+            "explanation": xai_service.explain_prediction_shap(
+                model=model, features_df=features_df, prediction_value=prediction
+            ),
+        }
+
+    # --- API asíncrona: las mismas inferencias en el pool de inferencia (cola acotada) ---
+    # Los handlers async deben usar estas: Prophet/XGBoost nunca corren en el event loop.
+
+    async def _submit(self, method: str, *args, **kwargs) -> Any:
+        from app.services.inference_executor import inference_executor
+        return await inference_executor.submit(method, *args, **kwargs)
+
+    async def apredict_campus_consumption(self, campus_code: str, days: int = 7, start_date: Optional[datetime] = None,
+                                          quantiles: Optional[List[float]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Versión awaitable de predict_campus_consumption. Las ventanas dentro del
+        marco diario se recortan aquí de un único marco por modelo@versión y día:
+        una ráfaga del dashboard (7, 30, 90 días...) cuesta un solo Prophet en el pool.
+        """
+        start_date = self._window_start(start_date)
+        if quantiles is None and self._in_superset(start_date or datetime.now(), days):
+            frame = await self._aforecast_superset(campus_code)
+            if frame is None:
+                return None
+            result = self._slice_forecast_superset(frame, start_date or datetime.now(), days)
+            if result is not None:
+                return result
+        # Tupla: argumentos hashables para que las peticiones iguales se agrupen en el pool
+        return await self._submit("predict_campus_consumption", campus_code, days=days, start_date=start_date,
+                                  quantiles=tuple(quantiles) if quantiles is not None else None)
+
+    @staticmethod
+    def _window_start(start_date: Optional[datetime]) -> Optional[datetime]:
+        """
+        Inicio de ventana al día (None si es hoy). Los endpoints pasan
+        `datetime.now() - timedelta(...)`, con microsegundos: sin normalizar,
+        la clave de agrupación del pool cambiaría en cada petición.
+        """
+        if start_date is None or start_date.date() == datetime.now().date():
+            return None
+        return datetime.combine(start_date.date(), datetime.min.time())
+
+    async def _aforecast_superset(self, campus_code: str) -> Optional[Dict[str, Any]]:
+        """
+        Marco diario desde el caché de este proceso o, si falta, calculado una vez en el pool.
+        Este proceso no carga los modelos: la versión del disco solo sirve para buscar.
+        Se guarda con la versión que usó el worker, que puede seguir con un artefacto
+        anterior hasta que se renueve el pool.
+        """
+        model_key = self.PROPHET_MODELS.get(campus_code, "prophet_tun")
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        suffix = f"superset_{today.strftime('%Y%m%d')}"
+        frame = self._prediction_cache.get(f"{model_key}@{self.get_model_version(model_key)}:{suffix}")
+        if frame is None:
+            # Mismo modelo -> misma clave en el pool: las peticiones simultáneas esperan a una sola ejecución
+            version, frame = await self._submit("forecast_superset", model_key)
+            if frame is not None:
+                seconds_left = (today + timedelta(days=1) - datetime.now()).total_seconds()
+                self._prediction_cache.set(f"{model_key}@{version}:{suffix}", frame, ttl_seconds=max(seconds_left, 1.0))
+        return frame
+
+    async def astream_campus_consumption(self, campus_code: str, days: int, start_date: Optional[datetime] = None,
+                                         chunk_days: int = 30) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Pronóstico diario por tramos de `chunk_days` días. El siguiente tramo se
+        calcula mientras se entrega el actual; la memoria no crece con el horizonte.
+        Sin modelo no produce tramos; si falla un tramo posterior lanza RuntimeError
+        en vez de cortar la exportación en silencio.
+        """
+        base_date = start_date or datetime.now()
+        offsets = range(0, days, chunk_days)
+
+        def submit(offset: int) -> asyncio.Task:
+            return asyncio.ensure_future(self._submit(
+                "forecast_chunk", campus_code, base_date + timedelta(days=offset), min(chunk_days, days - offset)
+            ))
+
+        pending = submit(offsets[0]) if offsets else None
+        try:
+            for i in range(len(offsets)):
+                chunk = await pending
+                pending = submit(offsets[i + 1]) if i + 1 < len(offsets) else None
+                if chunk is None:
+                    if i == 0:
+                        return
+                    raise RuntimeError(f"Pronóstico interrumpido para {campus_code} en el tramo {i}")
+                yield chunk
+        finally:
+            if pending is not None:
+                pending.cancel()
+
+    async def apredict_resource_impact(self, campus_code: str, **kwargs) -> Dict[str, float]:
+        """Versión awaitable de predict_resource_impact."""
+        return await self._submit("predict_resource_impact", campus_code, **kwargs)
+
+    async def apredict_resource_impact_batch(self, campus_code: str, rows: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """Versión awaitable de predict_resource_impact_batch."""
+        return await self._submit("predict_resource_impact_batch", campus_code, rows)
+
+    async def apredict_resource_impact_grid(self, campus_code: str, rows: List[Dict[str, Any]]) -> List[Dict[str, float]]:
+        """Versión awaitable de predict_resource_impact_grid."""
+        return await self._submit("predict_resource_impact_grid", campus_code, rows)
+
+    async def apredict_hourly_consumption(self, campus_code: str, days: int = 7, start_date: Optional[datetime] = None,
+                                          sector: Optional[str] = None, inputs: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Versión awaitable de predict_hourly_consumption."""
+        return await self._submit("predict_hourly_consumption", campus_code, days, self._window_start(start_date), sector, inputs)
+
+    async def apredict_scenario_sweep(self, campus_code: str, axes: Dict[str, List[float]], fixed: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Versión awaitable de predict_scenario_sweep."""
+        return await self._submit("predict_scenario_sweep", campus_code, axes, fixed)
+
+    async def aexplain_energy_prediction(self, campus_code: str, **inputs) -> Optional[Dict[str, Any]]:
+        """Versión awaitable de explain_energy_prediction (SHAP también sale del event loop)."""
+        return await self._submit("explain_energy_prediction", campus_code, **inputs)
+
+    def warm_up(self) -> Dict[str, str]:
+        """
+        Carga los modelos de MODEL_FILES y ejecuta una predicción de prueba
+        con cada uno (llena el marco de pronóstico y compila la vía rápida),
+        para que la primera petición tenga la misma latencia que las siguientes.
+        """
+        status: Dict[str, str] = {}
+        for model_key in self.MODEL_FILES:
+            if resolve_artifact(self.models_path, self.MODEL_FILES[model_key]) is None:
+                status[model_key] = "missing"
+            elif model_key in self.PROPHET_MODELS.values():
+                # Con vía rápida precompilada no hace falta deserializar el Prophet completo
+                status[model_key] = "loaded"
+            else:
+                status[model_key] = "loaded" if self._get_model(model_key) is not None else "error"
+
+        for campus_code, model_key in self.PROPHET_MODELS.items():
+            if status[model_key] == "loaded" and self.predict_campus_consumption(campus_code, days=7) is None:
+                status[model_key] = "error"
+
+        try:
+            self.predict_resource_impact_batch("tun", [{}])
+            for campus_code in self.SEDE_CODES:
+                self._get_impact_grid(campus_code)
+        except Exception:
+            for model_key, _, _ in self.XGB_MODELS_CONFIG:
+                if status[model_key] == "loaded":
+                    status[model_key] = "error"
+
+        self.model_status = status
+        logger.info(f"Modelos precargados: {status}")
+        return status
+
+    def preload_for_fork(self) -> Dict[str, str]:
+        """
+        Modo de despliegue multi-worker (gunicorn --preload, ver gunicorn.conf.py):
+        el proceso maestro carga y calienta todo (incluida la vía rápida, que
+        necesita la historia para sus bandas) y luego aligera los Prophet para
+        que los workers compartan las mismas páginas de memoria tras el fork.
+        """
+        status = self.warm_up()
+        for model_key in self.PROPHET_MODELS.values():
+            model = self.models.get(model_key)
+            if model is not None:
+                strip_prophet_for_inference(model)
+        return status
+
+    def _after_fork_in_child(self) -> None:
+        """Locks, hilos y pools del maestro no sirven en el worker: se recrean."""
+        import threading
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+        self._model_locks = {key: threading.Lock() for key, _, _ in self.XGB_MODELS_CONFIG}
+        self._xgb_executor = None
+        self._watcher = None
+        self._watcher_stop = threading.Event()
+
+    def cache_stats(self) -> Dict[str, Any]:
+        """Contadores del caché de pronósticos (hits, misses, desalojos...) y del single-flight."""
+        return {**self._prediction_cache.stats(), "single_flight": self._single_flight.stats()}
+
     def get_efficiency_ratio(self, sector: str = "total") -> Dict[str, float]:
         """Devuelve los ratios de eficiencia por sector."""
         return self.EFFICIENCY_RATIOS.get(sector, self.EFFICIENCY_RATIOS['total'])
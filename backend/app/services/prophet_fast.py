@@ -0,0 +1,172 @@
+"""
+Inferencia Prophet Rápida (determinista, sin muestreo de incertidumbre)
+Extrae del modelo ajustado los parámetros (tendencia por tramos, coeficientes
+de Fourier de cada estacionalidad y efectos de festivos) y calcula `yhat` y
+`trend` con NumPy vectorizado. Los intervalos salen de cuantiles de los
+residuos del ajuste, calculados una sola vez por modelo.
+"""
+import logging
+from dataclasses import dataclass, field
+from statistics import NormalDist
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger("app")
+
+_EPOCH = np.datetime64("1970-01-01T00:00:00", "ns")
+_NS_PER_DAY = 86_400 * 10**9
+
+# Mínimo de filas de historia para estimar las bandas por cuantiles de residuos
+_MIN_RESIDUALS = 30
+
+# Rango de fechas para el que se precalculan los efectos de festivos
+HOLIDAY_TABLE_RANGE: Tuple[str, str] = ("2015-01-01", "2035-12-31")
+
+
+@dataclass
+class CompiledProphet:
+    """Parámetros de un modelo Prophet listos para evaluación vectorizada."""
+    growth: str
+    start_ns: int
+    t_scale_ns: float
+    y_scale: float
+    floor: float
+    k: float
+    m: float
+    deltas: np.ndarray
+    changepoints_t: np.ndarray
+    # (columna inicial, periodo en días, orden de Fourier) por estacionalidad
+    seasonalities: List[Tuple[int, float, int]]
+    beta_add: np.ndarray
+    beta_mult: np.ndarray
+    n_features: int
+    # Festivos: columnas de X y tabla diaria de features desde holiday_day0 (días desde epoch)
+    holiday_cols: np.ndarray = field(default_factory=lambda: np.array([], dtype=int))
+    holiday_table: Optional[np.ndarray] = None
+    holiday_day0: int = 0
+    interval: Tuple[float, float] = (0.0, 0.0)
+
+
+def compile_prophet(model: Any) -> Optional[CompiledProphet]:
+    """
+    Extrae los parámetros de un Prophet ajustado.
+    Devuelve None si el modelo usa algo no soportado (crecimiento logístico,
+    estacionalidades condicionales o regresores extra): en ese caso se usa model.predict.
+    """
+    if model.growth not in ("linear", "flat") or model.extra_regressors:
+        return None
+    if any(props.get("condition_name") for props in model.seasonalities.values()):
+        return None
+
+    # Orden de columnas de la matriz de features usada en el ajuste
+    probe = model.setup_dataframe(pd.DataFrame({"ds": pd.to_datetime([HOLIDAY_TABLE_RANGE[0]])}))
+    probe_X, _, component_cols, _ = model.make_all_seasonality_features(probe)
+    columns = list(probe_X.columns)
+
+    seasonalities = []
+    seasonal_positions = set()
+    for name, props in model.seasonalities.items():
+        first = columns.index(f"{name}_delim_1")
+        seasonalities.append((first, float(props["period"]), int(props["fourier_order"])))
+        seasonal_positions.update(range(first, first + 2 * int(props["fourier_order"])))
+    holiday_cols = np.array([i for i in range(len(columns)) if i not in seasonal_positions], dtype=int)
+
+    beta = np.nanmean(model.params["beta"], axis=0)
+    scaling = getattr(model, "scaling", "absmax")
+    compiled = CompiledProphet(
+        growth=model.growth,
+        start_ns=pd.Timestamp(model.start).value,
+        t_scale_ns=float(pd.Timedelta(model.t_scale).value),
+        y_scale=float(model.y_scale),
+        floor=float(model.y_min) if scaling == "minmax" else 0.0,
+        k=float(np.nanmean(model.params["k"])),
+        m=float(np.nanmean(model.params["m"])),
+        deltas=np.nanmean(model.params["delta"], axis=0),
+        changepoints_t=np.asarray(model.changepoints_t, dtype=float),
+        seasonalities=seasonalities,
+        beta_add=beta * component_cols["additive_terms"].to_numpy(),
+        beta_mult=beta * component_cols["multiplicative_terms"].to_numpy(),
+        n_features=len(columns),
+        holiday_cols=holiday_cols,
+    )
+
+    if len(holiday_cols):
+        days = pd.DataFrame({"ds": pd.date_range(*HOLIDAY_TABLE_RANGE, freq="D")})
+        days_X, _, _, _ = model.make_all_seasonality_features(model.setup_dataframe(days))
+        compiled.holiday_table = days_X.to_numpy()[:, holiday_cols].astype(np.float32)
+        compiled.holiday_day0 = int((np.datetime64(HOLIDAY_TABLE_RANGE[0], "ns") - _EPOCH) // _NS_PER_DAY)
+
+    compiled.interval = _residual_interval(model, compiled)
+    return compiled
+
+
+def _residual_interval(model: Any, compiled: CompiledProphet) -> Tuple[float, float]:
+    """Cuantiles de los residuos del ajuste al `interval_width` del modelo."""
+    width = float(getattr(model, "interval_width", 0.8))
+    history = getattr(model, "history", None)
+    if history is not None and len(history) >= _MIN_RESIDUALS:
+        fitted = fast_predict(compiled, history["ds"].to_numpy(dtype="datetime64[ns]"), with_bounds=False)
+        if fitted is not None:
+            residuals = history["y"].to_numpy(dtype=float) - fitted["yhat"]
+            return (
+                float(np.quantile(residuals, (1 - width) / 2)),
+                float(np.quantile(residuals, (1 + width) / 2)),
+            )
+    # Sin historia suficiente (p. ej. modelo aligerado): ruido observacional gaussiano
+    z = NormalDist().inv_cdf((1 + width) / 2)
+    sigma = float(np.nanmean(model.params["sigma_obs"])) * compiled.y_scale
+    return (-z * sigma, z * sigma)
+
+
+def fast_predict(compiled: CompiledProphet, ds: np.ndarray, with_bounds: bool = True) -> Optional[Dict[str, np.ndarray]]:
+    """
+    Evalúa yhat/trend (y bandas) para un vector de fechas datetime64[ns].
+    Devuelve None si alguna fecha cae fuera de la tabla de festivos.
+    """
+    ds_ns = np.asarray(ds, dtype="datetime64[ns]")
+    n = len(ds_ns)
+    X = np.zeros((n, compiled.n_features))
+
+    if compiled.holiday_table is not None:
+        day_idx = (ds_ns - _EPOCH).astype(np.int64) // _NS_PER_DAY - compiled.holiday_day0
+        if n and (day_idx.min() < 0 or day_idx.max() >= len(compiled.holiday_table)):
+            return None
+        X[:, compiled.holiday_cols] = compiled.holiday_table[day_idx]
+
+    # Estacionalidades: series de Fourier (sin, cos) por orden, como Prophet.fourier_series
+    t_days = (ds_ns - _EPOCH).astype(np.int64) / _NS_PER_DAY
+    for first, period, order in compiled.seasonalities:
+        angles = (2 * np.pi / period) * np.outer(t_days, np.arange(1, order + 1))
+        X[:, first:first + 2 * order:2] = np.sin(angles)
+        X[:, first + 1:first + 2 * order:2] = np.cos(angles)
+
+    # Tendencia lineal por tramos (o plana)
+    t = (ds_ns.astype(np.int64) - compiled.start_ns) / compiled.t_scale_ns
+    if compiled.growth == "linear":
+        active = (compiled.changepoints_t[None, :] <= t[:, None]) * compiled.deltas
+        trend_scaled = (compiled.k + active.sum(axis=1)) * t + (compiled.m - (active * compiled.changepoints_t).sum(axis=1))
+    else:
+        trend_scaled = np.full(n, compiled.m)
+    trend = trend_scaled * compiled.y_scale + compiled.floor
+
+    yhat = trend * (1 + X @ compiled.beta_mult) + (X @ compiled.beta_add) * compiled.y_scale
+    result = {"yhat": yhat, "trend": trend}
+    if with_bounds:
+        result["yhat_lower"] = yhat + compiled.interval[0]
+        result["yhat_upper"] = yhat + compiled.interval[1]
+    return result
+
+
+def check_accuracy(model: Any, compiled: CompiledProphet, ds: np.ndarray) -> Dict[str, float]:
+    """Error máximo (absoluto y relativo a y_scale) de yhat/trend frente a model.predict."""
+    reference = model.predict(pd.DataFrame({"ds": pd.to_datetime(ds)}))
+    fast = fast_predict(compiled, ds, with_bounds=False)
+    if fast is None:
+        return {"max_abs_error": float("inf"), "max_rel_error": float("inf")}
+    error = max(
+        float(np.max(np.abs(fast["yhat"] - reference["yhat"].to_numpy()), initial=0.0)),
+        float(np.max(np.abs(fast["trend"] - reference["trend"].to_numpy()), initial=0.0)),
+    )
+    return {"max_abs_error": error, "max_rel_error": error / compiled.y_scale}
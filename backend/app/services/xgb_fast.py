@@ -0,0 +1,137 @@
+"""
+Inferencia XGBoost Rápida (evaluador de árboles compilado)
+Aplana los árboles del booster en arrays NumPy de nodos (feature, umbral,
+hijo izquierdo/derecho, dirección por defecto para NaN y valor de hoja) y
+recorre todos los árboles a la vez, nivel por nivel, para una fila o un lote
+pequeño. Evita el coste fijo DataFrame -> DMatrix -> booster, que domina
+cuando se puntúa una sola fila.
+"""
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger("app")
+
+# Objetivos con enlace identidad: la salida es directamente el margen
+_IDENTITY_OBJECTIVES = {"reg:squarederror", "reg:absoluteerror", "reg:pseudohubererror"}
+
+
+@dataclass
+class CompiledEnsemble:
+    """Árboles de un booster concatenados en arrays planos (un índice global por nodo)."""
+    feature_names: List[str]
+    base_margin: float
+    # Raíz de cada árbol dentro de los arrays de nodos
+    roots: np.ndarray
+    feature: np.ndarray
+    threshold: np.ndarray
+    # En las hojas left == right == el propio nodo: el recorrido se queda quieto
+    left: np.ndarray
+    right: np.ndarray
+    default_left: np.ndarray
+    leaf_value: np.ndarray
+    max_depth: int
+
+
+def compile_booster(model: Any) -> Optional[CompiledEnsemble]:
+    """
+    Extrae los árboles de un XGBRegressor (o Booster) desde su volcado JSON.
+    Devuelve None si usa algo no soportado (dart, splits categóricos, varios
+    objetivos o un enlace no identidad): en ese caso se usa model.predict.
+    """
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    learner = json.loads(booster.save_raw("json"))["learner"]
+    gbm = learner["gradient_booster"]
+    params = learner["learner_model_param"]
+    if gbm["name"] != "gbtree" or learner["objective"]["name"] not in _IDENTITY_OBJECTIVES:
+        return None
+    if int(params.get("num_target", 1)) > 1 or int(params.get("num_class", 0)) > 1:
+        return None
+
+    trees = gbm["model"]["trees"]
+    # Con early stopping, predict() solo usa hasta best_iteration
+    best_iteration = booster.attributes().get("best_iteration")
+    if best_iteration is not None:
+        per_round = int(gbm["model"]["gbtree_model_param"]["num_parallel_tree"])
+        trees = trees[: (int(best_iteration) + 1) * per_round]
+
+    roots, features, thresholds, lefts, rights, defaults, leaves = [], [], [], [], [], [], []
+    max_depth = 0
+    offset = 0
+    for tree in trees:
+        if any(tree["split_type"]) or int(tree["tree_param"].get("size_leaf_vector", 1)) > 1:
+            return None
+        left = np.asarray(tree["left_children"], dtype=np.int64)
+        right = np.asarray(tree["right_children"], dtype=np.int64)
+        n_nodes = len(left)
+        own = np.arange(n_nodes)
+        is_leaf = left == -1
+
+        roots.append(offset)
+        # En las hojas split_conditions guarda el valor de la hoja
+        conditions = np.asarray(tree["split_conditions"], dtype=np.float32)
+        features.append(np.where(is_leaf, 0, tree["split_indices"]).astype(np.int32))
+        thresholds.append(np.where(is_leaf, 0.0, conditions).astype(np.float32))
+        lefts.append(np.where(is_leaf, own, left) + offset)
+        rights.append(np.where(is_leaf, own, right) + offset)
+        defaults.append(np.asarray(tree["default_left"], dtype=bool))
+        leaves.append(np.where(is_leaf, conditions, 0.0).astype(np.float32))
+        max_depth = max(max_depth, _tree_depth(left, right))
+        offset += n_nodes
+
+    return CompiledEnsemble(
+        feature_names=list(booster.feature_names or []),
+        base_margin=float(str(params["base_score"]).strip("[]")),
+        roots=np.asarray(roots, dtype=np.int64),
+        feature=np.concatenate(features) if trees else np.zeros(0, np.int32),
+        threshold=np.concatenate(thresholds) if trees else np.zeros(0, np.float32),
+        left=np.concatenate(lefts) if trees else np.zeros(0, np.int64),
+        right=np.concatenate(rights) if trees else np.zeros(0, np.int64),
+        default_left=np.concatenate(defaults) if trees else np.zeros(0, bool),
+        leaf_value=np.concatenate(leaves) if trees else np.zeros(0, np.float32),
+        max_depth=max_depth,
+    )
+
+
+def _tree_depth(left: np.ndarray, right: np.ndarray) -> int:
+    """Profundidad máxima de un árbol (número de splits de la raíz a la hoja más honda)."""
+    depth, level = 0, np.array([0])
+    while True:
+        level = level[left[level] != -1]
+        if not len(level):
+            return depth
+        level = np.concatenate([left[level], right[level]])
+        depth += 1
+
+
+def fast_predict(compiled: CompiledEnsemble, X: np.ndarray) -> np.ndarray:
+    """
+    Predicción para una matriz (n_filas, n_features) en el orden de feature_names.
+    Los NaN siguen la rama por defecto, como en XGBoost.
+    """
+    X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+    rows = np.arange(len(X))[:, None]
+    node = np.broadcast_to(compiled.roots, (len(X), len(compiled.roots)))
+    for _ in range(compiled.max_depth):
+        value = X[rows, compiled.feature[node]]
+        go_left = np.where(np.isnan(value), compiled.default_left[node], value < compiled.threshold[node])
+        node = np.where(go_left, compiled.left[node], compiled.right[node])
+
+    # Acumulación en float32 árbol a árbol, en el mismo orden que XGBoost
+    leaf = compiled.leaf_value[node]
+    out = np.full(len(X), compiled.base_margin, dtype=np.float32)
+    for j in range(leaf.shape[1]):
+        out += leaf[:, j]
+    return out
+
+
+def check_accuracy(model: Any, compiled: CompiledEnsemble, X: Any) -> Dict[str, float]:
+    """Error máximo (absoluto y relativo a la escala de la salida) frente a model.predict."""
+    reference = np.asarray(model.predict(X), dtype=np.float64)
+    fast = fast_predict(compiled, np.asarray(X)).astype(np.float64)
+    error = float(np.max(np.abs(fast - reference), initial=0.0))
+    scale = max(float(np.max(np.abs(reference), initial=0.0)), 1.0)
+    return {"max_abs_error": error, "max_rel_error": error / scale}
@@ -0,0 +1,32 @@
+"""Gunicorn config for multi-worker deployments sharing models copy-on-write.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+The master imports the app and loads every model once (``preload_app``),
+strips training-only state from the Prophet models and freezes the GC so
+refcount/GC passes in the workers don't touch (and copy) the shared pages.
+Workers are then forked and serve inference in their own threads.
+"""
+import gc
+import os
+
+# Inferencia en hilos de cada worker: un pool de procesos por worker volvería a cargar los modelos
+os.environ.setdefault("INFERENCE_WORKERS", "0")
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "8"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = 120
+
+
+def when_ready(server):
+    """Runs in the master after the app is imported and before any worker is forked."""
+    from app.services.prediction_service import prediction_service
+
+    status = prediction_service.preload_for_fork()
+    server.log.info(f"Models preloaded for fork: {status}")
+    # Everything allocated so far moves to the permanent generation: the GC
+    # in the workers no longer writes to these objects' headers.
+    gc.collect()
+    gc.freeze()
@@ -0,0 +1,22 @@
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.getcwd())
+
+from app.core.config import get_settings
+from app.services.model_artifacts import convert_models
+from app.services.prediction_service import PredictionService, prediction_service
+
+def main():
+    models_path = sys.argv[1] if len(sys.argv) > 1 else prediction_service.models_path
+    print(f"📦 Convirtiendo modelos de {models_path} a formato nativo...")
+
+    written = convert_models(models_path, PredictionService.MODEL_FILES, tolerance=get_settings().prophet_fast_tolerance)
+    for path in written:
+        print(f"   ✅ {path}")
+
+    print(f"✨ {len(written)} artefactos escritos. Los .pkl se conservan como respaldo.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import asyncio
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.getcwd())
+
+from app.core.config import get_settings
+from app.db.session import get_async_session
+from app.services.model_training import load_daily_readings, refit_all
+from app.services.prediction_service import PredictionService, prediction_service
+
+async def load_readings():
+    async for db in get_async_session():
+        return await load_daily_readings(db, PredictionService.PROPHET_MODELS)
+
+def main():
+    settings = get_settings()
+    models_path = sys.argv[1] if len(sys.argv) > 1 else prediction_service.models_path
+    print(f"🔁 Reentrenando modelos Prophet de {models_path} con consumption_records...")
+
+    readings = asyncio.run(load_readings())
+    results = refit_all(
+        models_path,
+        PredictionService.MODEL_FILES,
+        readings,
+        workers=settings.prophet_refit_workers,
+        keep=settings.prophet_refit_keep_versions,
+        tolerance=settings.prophet_fast_tolerance,
+    )
+    for model_key, result in results.items():
+        print(f"   {model_key}: {result}")
+
+    print("✨ Listo. Los workers cargan las versiones nuevas con MODEL_WATCH_INTERVAL_SECONDS o POST /health/models/reload.")
+
+if __name__ == "__main__":
+    main()
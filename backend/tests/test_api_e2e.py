@@ -76,5 +76,18 @@ def test_e2e_user_journey():
 
     print("\n=== E2E FINALIZADO ===")
 
+def test_health_is_unavailable_until_models_are_warm():
+    from app.services.prediction_service import prediction_service
+
+    previous = prediction_service.readiness_state
+    try:
+        for state, expected in (("warming", "starting"), ("failed", "degraded")):
+            prediction_service.readiness_state = state
+            response = client.get("/api/v1/health/")
+            assert response.status_code == 503
+            assert response.json()["status"] == expected
+    finally:
+        prediction_service.readiness_state = previous
+
 if __name__ == "__main__":
     test_e2e_user_journey()
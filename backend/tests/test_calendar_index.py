@@ -0,0 +1,44 @@
+import sys
+import os
+from datetime import date, datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+
+from app.services.calendar_index import HOLIDAYS_FIXED, calendar_index
+
+def test_lookup_matches_python_calendar():
+    days = [date(2015, 1, 1) + timedelta(days=i) for i in range(0, 7670, 13)]
+    flags = calendar_index.lookup(days, "tun")
+    assert flags["weekday"].tolist() == [d.weekday() for d in days]
+    assert flags["month"].tolist() == [d.month for d in days]
+    assert flags["is_weekend"].tolist() == [d.weekday() >= 5 for d in days]
+
+def test_colombian_holidays_and_academic_periods():
+    # Los mismos festivos fijos con que se generaron los datos y se entrenaron los modelos
+    days = [date(2015, 1, 1) + timedelta(days=i) for i in range(7670)]
+    assert calendar_index.lookup(days)["is_holiday"].tolist() == [(d.month, d.day) in HOLIDAYS_FIXED for d in days]
+    assert calendar_index.is_holiday(datetime(2025, 8, 7, 15, 30))
+    assert not calendar_index.is_holiday(date(2025, 1, 6))
+    assert calendar_index.is_academic(date(2025, 3, 10), "duitama")
+    assert not calendar_index.is_academic(date(2025, 7, 10), "dui")
+
+def test_dates_outside_the_index_are_still_answered():
+    hourly = np.arange("2040-12-24T00", "2040-12-26T00", dtype="datetime64[h]")
+    flags = calendar_index.lookup(hourly)
+    assert flags["is_holiday"].sum() == 24  # Navidad, las 24 horas
+    assert len(flags["month"]) == 48
+
+def test_xgb_features_take_calendar_flags_for_today(monkeypatch):
+    from app.services.prediction_service import PredictionService, prediction_service
+
+    # "Hoy" = Navidad 2025 (jueves festivo, fuera del semestre)
+    christmas = calendar_index.lookup(np.array(["2025-12-25"], dtype="datetime64[D]"), "tun")
+    monkeypatch.setattr(PredictionService, "_calendar_today", staticmethod(lambda campus_code: christmas))
+
+    single = prediction_service.build_xgb_features("tun")
+    assert single[["dia_numero", "es_festivo", "en_periodo_academico", "mes"]].iloc[0].tolist() == [3, 1, 0, 12]
+
+    batch = prediction_service.build_xgb_features_batch("tun", [{}, {"es_festivo": False, "en_periodo_academico": True}])
+    assert batch["es_festivo"].tolist() == [1, 0]
+    assert batch["en_periodo_academico"].tolist() == [0, 1]
@@ -2,6 +2,7 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import numpy as np
 import pytest
 from app.services.prediction_service import prediction_service
 
@@ -48,5 +49,98 @@ def test_prediction_service_edge_cases():
     assert impact_huge['energy_prediction'] > 0
     print("   ✅ ÉXITO: El sistema escaló la predicción.")
 
+def test_batch_matches_single_predictions():
+    print("\n=== LOTE vs. LLAMADAS INDIVIDUALES ===")
+    rows = [{"area_m2": area, "hora": h} for area in (100.0, 1200.0, -5.0) for h in (2, 12, 22)]
+
+    batch = prediction_service.predict_resource_impact_batch("tun", rows)
+    single = [prediction_service.predict_resource_impact("tun", **row) for row in rows]
+
+    assert batch == single
+    assert prediction_service.predict_resource_impact_batch("tun", []) == []
+    print(f"   ✅ ÉXITO: {len(rows)} filas en una inferencia por modelo.")
+
+def test_impact_grid_matches_batch():
+    print("\n=== TABLA PRECALCULADA vs. MODELO ===")
+    areas = prediction_service.IMPACT_GRID_AREAS
+    # En los puntos de la tabla la lectura coincide con el modelo
+    rows = [{"area_m2": float(areas[i]), "hora": h} for i in (0, 60, 120) for h in (2, 12, 22)]
+    assert prediction_service.predict_resource_impact_grid("tun", rows) == prediction_service.predict_resource_impact_batch("tun", rows)
+
+    # Entradas que la tabla no cubre se resuelven con el modelo
+    other = [{"hora": 3, "temp_promedio_c": 30.0}, {"area_m2": 1e7}]
+    assert prediction_service.predict_resource_impact_grid("tun", other) == prediction_service.predict_resource_impact_batch("tun", other)
+    print("   ✅ ÉXITO: Curvas horarias servidas desde la tabla.")
+
+def test_scenario_sweep_matches_batch():
+    print("\n=== BARRIDO WHAT-IF vs. LOTE ===")
+    temps = [8.0, 18.0, 28.0]
+    students = [1000, 5000]
+    hours = list(range(24))
+    sweep = prediction_service.predict_scenario_sweep(
+        "tun", {"temp_promedio_c": temps, "num_estudiantes": students, "hora": hours}, {"area_m2": 5000}
+    )
+    assert sweep["shape"] == [3, 2, 24] and sweep["points"] == 144
+
+    rows = [{"temp_promedio_c": t, "num_estudiantes": s, "hora": h, "area_m2": 5000}
+            for t in temps for s in students for h in hours]
+    batch = prediction_service.predict_resource_impact_batch("tun", rows)
+    for key, surface in sweep["surfaces"].items():
+        flat = [v for plane in surface for line in plane for v in line]
+        assert flat == [r[key] for r in batch]
+
+    with pytest.raises(ValueError):
+        prediction_service.predict_scenario_sweep("tun", {"viento": [1, 2]})
+    with pytest.raises(ValueError):
+        prediction_service.predict_scenario_sweep("tun", {"hora": list(range(24)), "area_m2": list(range(20000))})
+    print("   ✅ ÉXITO: Superficies coherentes con la predicción por lote.")
+
+def test_hourly_forecast_sums_to_daily_level():
+    print("\n=== PRONÓSTICO HORARIO ===")
+    from datetime import datetime
+    for sector in (None, "laboratorios"):
+        hourly = prediction_service.predict_hourly_consumption("tun", days=3, start_date=datetime(2025, 3, 7), sector=sector)
+        assert len(hourly["values"]) == 72
+        assert hourly["timestamps"][0] == "2025-03-07T00:00" and hourly["timestamps"][25] == "2025-03-08T01:00"
+        assert hourly["hours"][:3] == [0, 1, 2]
+        daily = [sum(hourly["values"][d * 24:(d + 1) * 24]) for d in range(3)]
+        assert daily == pytest.approx(hourly["daily"], abs=0.2)
+    assert hourly["shape_source"] == "profile"
+    print("   ✅ ÉXITO: Cada día reparte su nivel diario en 24 horas.")
+
+def test_quantiles_reuse_cached_samples():
+    print("\n=== CUANTILES DESDE MUESTRAS EN CACHÉ ===")
+    calls = []
+    original = prediction_service._prophet_samples
+    def counting(model_key, ds):
+        calls.append(len(ds))
+        return original(model_key, ds)
+    prediction_service._prophet_samples = counting
+    try:
+        first = prediction_service.predict_campus_consumption("dui", days=10, quantiles=[0.1, 0.5, 0.9])
+        other = prediction_service.predict_campus_consumption("dui", days=5, quantiles=[0.05, 0.95])
+    finally:
+        prediction_service._prophet_samples = original
+
+    # Un único muestreo (el del marco completo) sirve a ventanas y cuantiles distintos
+    assert len(calls) == 1
+    q = first["quantiles"]
+    assert set(q) == {"0.1", "0.5", "0.9"} and len(q["0.5"]) == 10
+    assert all(a <= b <= c for a, b, c in zip(q["0.1"], q["0.5"], q["0.9"]))
+    assert all(a <= b for a, b in zip(other["quantiles"]["0.05"], q["0.1"]))
+    # Bandas del 80% y cuantiles 0.1/0.9 salen de las mismas muestras
+    np.testing.assert_allclose(first["lower_bound"], q["0.1"], atol=0.01)
+    np.testing.assert_allclose(first["upper_bound"], q["0.9"], atol=0.01)
+    assert "quantiles" not in prediction_service.predict_campus_consumption("dui", days=10)
+
+    with pytest.raises(ValueError):
+        prediction_service.predict_campus_consumption("dui", days=10, quantiles=[1.5])
+    print("   ✅ ÉXITO: Bandas a medida sin volver a ejecutar Prophet.")
+
 if __name__ == "__main__":
     test_prediction_service_edge_cases()
+    test_batch_matches_single_predictions()
+    test_impact_grid_matches_batch()
+    test_scenario_sweep_matches_batch()
+    test_hourly_forecast_sums_to_daily_level()
+    test_quantiles_reuse_cached_samples()
@@ -0,0 +1,159 @@
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.core.cache import LRUTTLCache, SingleFlight, build_cache
+
+def test_lru_eviction_respects_max_entries():
+    cache = LRUTTLCache(max_entries=3, ttl_seconds=60)
+    for i in range(3):
+        cache.set(f"tun_{i}", i)
+
+    # Tocar la clave más antigua la vuelve la más reciente
+    assert cache.get("tun_0") == 0
+    cache.set("tun_3", 3)
+
+    assert "tun_1" not in cache
+    assert cache.get("tun_0") == 0
+    assert len(cache) == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_max_bytes_bounds_memory():
+    cache = LRUTTLCache(max_entries=1000, ttl_seconds=60, max_bytes=2000)
+    for i in range(50):
+        cache.set(i, [float(x) for x in range(30)])
+
+    stats = cache.stats()
+    assert stats["bytes"] <= 2000
+    assert stats["evictions"] > 0
+
+def test_ttl_expiry_and_sweep():
+    cache = LRUTTLCache(max_entries=10, ttl_seconds=0.05)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl_seconds=60)
+    time.sleep(0.1)
+
+    assert cache.sweep() == 1
+    assert "a" not in cache
+    assert cache.get("b") == 2
+
+def test_hit_miss_counters():
+    cache = LRUTTLCache(max_entries=10, ttl_seconds=60)
+    cache.set("k", {"predictions": [1.0]})
+    cache.get("k")
+    cache.get("missing")
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    # Dos instancias sobre el mismo archivo simulan dos workers de uvicorn
+    path = str(tmp_path / "forecasts.sqlite3")
+    worker_a = build_cache("sqlite", path=path, max_entries=2, ttl_seconds=60)
+    worker_b = build_cache("sqlite", path=path, max_entries=2, ttl_seconds=60)
+
+    worker_a.set("prophet_tun@v1:tun_7_now", {"predictions": [1.5, 2.5]})
+    assert worker_b.get("prophet_tun@v1:tun_7_now") == {"predictions": [1.5, 2.5]}
+    assert worker_b.get("prophet_tun@v2:tun_7_now") is None
+
+    worker_b.set("k2", 2)
+    worker_b.set("k3", 3)
+    assert len(worker_a) == 2
+    assert worker_b.stats()["evictions"] == 1
+
+def test_single_flight_runs_concurrent_identical_calls_once():
+    flight = SingleFlight()
+    runs = []
+    release = threading.Event()
+
+    def slow_forecast():
+        runs.append(1)
+        release.wait(1)
+        return {"predictions": [1.0]}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do("prophet_tun@v1:superset", slow_forecast))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    while flight.stats()["coalesced"] < 7:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert len(runs) == 1
+    assert results == [{"predictions": [1.0]}] * 8
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 7}
+
+def test_dashboard_burst_runs_a_single_prophet(monkeypatch):
+    import asyncio
+    from datetime import datetime, timedelta
+    from app.services import inference_executor as executor_module
+    from app.services.inference_executor import InferenceExecutor
+    from app.services.prediction_service import prediction_service
+
+    executor = InferenceExecutor(max_workers=0)
+    monkeypatch.setattr(executor_module, "inference_executor", executor)
+    prediction_service._prediction_cache.clear()
+    runs = []
+    original = prediction_service._prophet_forecast
+    def counting_forecast(model_key, ds):
+        runs.append(model_key)
+        time.sleep(0.05)
+        return original(model_key, ds)
+    monkeypatch.setattr(prediction_service, "_prophet_forecast", counting_forecast)
+
+    async def burst():
+        # Como los endpoints: `datetime.now() - timedelta(...)` en cada petición
+        return await asyncio.gather(*[
+            prediction_service.apredict_campus_consumption("tun", days=days, start_date=datetime.now() - timedelta(days=days))
+            for days in (7, 30, 30, 90) * 5
+        ])
+
+    results = asyncio.run(burst())
+    assert all(result is not None for result in results)
+    assert [len(result["dates"]) for result in results[:4]] == [7, 30, 30, 90]
+    assert runs == ["prophet_tun"]
+    assert executor.stats()["completed"] == 1
+
+def test_executor_counts_failures_apart_from_completions():
+    import asyncio
+    import pytest
+    from app.services.inference_executor import InferenceExecutor
+
+    executor = InferenceExecutor(max_workers=0)
+
+    async def run():
+        await executor.submit("get_efficiency_ratio")
+        with pytest.raises(ValueError):
+            await executor.submit("predict_campus_consumption", "tun", quantiles=(1.5,))
+
+    asyncio.run(run())
+    stats = executor.stats()
+    assert (stats["completed"], stats["failed"], stats["cancelled"]) == (1, 1, 0)
+    assert stats["pending"] == 0
+
+def test_executor_rejects_bursts_beyond_queue_size(monkeypatch):
+    import asyncio
+    import pytest
+    from app.core.exceptions import ServiceOverloadedError
+    from app.services.inference_executor import InferenceExecutor
+    from app.services.prediction_service import prediction_service
+
+    monkeypatch.setattr(prediction_service, "slow_call", lambda i: time.sleep(0.05) or i, raising=False)
+    executor = InferenceExecutor(max_workers=0, max_queue=2)
+
+    async def run():
+        # Argumentos distintos: nada se agrupa, cada llamada pide su cupo
+        return await asyncio.gather(*(executor.submit("slow_call", i) for i in range(20)), return_exceptions=True)
+
+    results = asyncio.run(run())
+    stats = executor.stats()
+    assert sum(isinstance(r, ServiceOverloadedError) for r in results) == 18
+    assert stats["rejected"] == 18 and stats["completed"] == 2
+    # La métrica de la cola refleja el límite, no la ráfaga
+    assert stats["max_pending"] == stats["queue_size"] == 2 and stats["pending"] == 0
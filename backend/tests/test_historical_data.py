@@ -0,0 +1,98 @@
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.historical_data_service import HistoricalDataGenerator
+
+def test_vectorized_range_matches_calendar_rules():
+    generator = HistoricalDataGenerator("duitama")
+    columns = generator.generate_range_arrays(2019, 2021, seed=3)
+    assert len(columns["date"]) == 365 * 3 + 1
+
+    current = datetime(2019, 1, 1)
+    for i in range(len(columns["date"])):
+        assert columns["is_holiday"][i] == generator.is_holiday(current)
+        assert columns["is_academic"][i] == generator.is_academic_period(current)
+        assert columns["covid_factor"][i] == generator.get_covid_factor(current)
+        assert columns["is_weekend"][i] == (current.weekday() >= 5)
+        current += timedelta(days=1)
+
+def test_vectorized_range_is_seedable():
+    generator = HistoricalDataGenerator("tunja")
+    first = generator.generate_range_arrays(2018, 2025, daily=False, seed=11)
+    second = generator.generate_range_arrays(2018, 2025, daily=False, seed=11)
+    for key in first:
+        np.testing.assert_array_equal(first[key], second[key])
+    assert len(first["consumption_kwh"]) == 2922 * 24
+
+    rows = generator.generate_historical_range(2018, 2018, seed=11)
+    assert rows[0]["date"] == "2018-01-01" and set(rows[0]["factors"]) == {"weekday", "academic", "covid", "efficiency"}
+
+def test_chunked_stream_is_reproducible_per_chunk():
+    generator = HistoricalDataGenerator("sogamoso")
+    chunks = list(generator.iter_range_chunks(2020, 2020, seed=7))
+    assert len(chunks) == 12
+    assert len(chunks[1]["consumption_kwh"]) == 29 * 24  # febrero bisiesto, horario
+    assert sum(len(c["timestamp"]) for c in chunks) == 366 * 24
+
+    # Cada tramo tiene su propio flujo: consumir solo los primeros da lo mismo
+    again = generator.iter_range_chunks(2020, 2020, seed=7)
+    for expected in chunks[:3]:
+        np.testing.assert_array_equal(next(again)["consumption_kwh"], expected["consumption_kwh"])
+
+    daily = list(generator.iter_range_chunks(2020, 2021, daily=True, chunk_days=100, seed=7))
+    assert [len(c["date"]) for c in daily][-1] == 731 - 700
+    assert not np.array_equal(daily[0]["consumption_kwh"][:30], daily[1]["consumption_kwh"][:30])
+
+def test_multi_campus_dataset_is_reproducible_across_workers(monkeypatch):
+    from app.services import historical_data_service
+
+    sectors = ["general", "laboratorios", "comedores"]
+    inline = historical_data_service.generate_dataset(sectors=sectors, start_year=2023, end_year=2024, daily=False, seed=5, workers=0)
+    assert len(inline) == 4 * 3 * 731 * 24
+    assert list(inline["campus"].cat.categories) == ["tunja", "duitama", "sogamoso", "chiquinquira"]
+
+    # Mismo resultado repartido en procesos, y cada combinación no depende de las demás
+    monkeypatch.setattr(historical_data_service, "DATASET_POOL_MIN_ROWS", 0)
+    pooled = historical_data_service.generate_dataset(sectors=sectors, start_year=2023, end_year=2024, daily=False, seed=5, workers=2)
+    pd.testing.assert_frame_equal(inline, pooled)
+    alone = historical_data_service.generate_dataset(["duitama"], ["comedores"], 2023, 2024, daily=False, seed=5, workers=0)
+    subset = inline[(inline["campus"] == "duitama") & (inline["sector"] == "comedores")]
+    np.testing.assert_array_equal(alone["consumption_kwh"].to_numpy(), subset["consumption_kwh"].to_numpy())
+
+def test_dataset_sectors_split_one_campus_series():
+    from app.services import historical_data_service
+
+    sectors = ["general", "salones", "bibliotecas"]
+    data = historical_data_service.generate_dataset(["sogamoso"], sectors, 2022, 2022, daily=True, seed=2, workers=0)
+    by_sector = {sector: data[data["sector"] == sector].reset_index(drop=True) for sector in sectors}
+    general = by_sector["general"]
+    for sector in sectors[1:]:
+        np.testing.assert_array_equal(by_sector[sector]["temperature_c"], general["temperature_c"])
+        np.testing.assert_allclose(by_sector[sector]["consumption_kwh"], general["consumption_kwh"] * historical_data_service.SECTOR_SHARES[sector])
+
+    hourly = historical_data_service.generate_dataset(["sogamoso"], ["general", "salones"], 2022, 2022, daily=False, seed=2, workers=0)
+    per_day = hourly.groupby(["sector", hourly["timestamp"].dt.floor("D")], observed=True)["consumption_kwh"].sum()
+    np.testing.assert_allclose(per_day["salones"].to_numpy(), per_day["general"].to_numpy() * 0.30, rtol=0.1)
+
+    with pytest.raises(ValueError):
+        historical_data_service.generate_dataset(["tunja"], ["cafeteria"], 2022, 2022)
+    with pytest.raises(ValueError):
+        historical_data_service.generate_dataset(["tunja"], ["bibliotecas"], 2022, 2022, daily=False)
+
+def test_overlapping_windows_agree():
+    generator = HistoricalDataGenerator("tunja")
+    wide = generator.generate_period_arrays(datetime(2025, 2, 20), 40, seed=1)
+    narrow = generator.generate_period_arrays(datetime(2025, 3, 2), 7, seed=1)
+    np.testing.assert_array_equal(narrow["date"], wide["date"][10:17])
+    np.testing.assert_array_equal(narrow["consumption_kwh"], wide["consumption_kwh"][10:17])
+
+    hourly = generator.generate_period_arrays(datetime(2025, 3, 1), 3, daily=False, seed=1)
+    shifted = generator.generate_period_arrays(datetime(2025, 3, 2), 2, daily=False, seed=1)
+    assert len(shifted["consumption_kwh"]) == 48
+    np.testing.assert_array_equal(shifted["consumption_kwh"], hourly["consumption_kwh"][24:])
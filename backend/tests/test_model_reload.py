@@ -0,0 +1,100 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import joblib
+import numpy as np
+import xgboost as xgb
+
+from app.services.prediction_service import PredictionService
+
+def save_energy_model(path, offset):
+    service = PredictionService(models_path=str(path))
+    X = service.build_xgb_features_batch("tun", [{"hora": h % 24, "area_m2": 100.0 + h} for h in range(200)])
+    model = xgb.XGBRegressor(n_estimators=5, max_depth=2)
+    model.fit(X, np.full(len(X), offset) + X["hora"].to_numpy())
+    joblib.dump(model, path / "xgb_energia.pkl")
+
+def bump_mtime(path, seconds):
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10**9))
+
+def test_reload_swaps_valid_artifact_and_keeps_old_on_failure(tmp_path):
+    save_energy_model(tmp_path, offset=100.0)
+    service = PredictionService(models_path=str(tmp_path))
+    before = service.predict_resource_impact("tun", hora=12)["energy_prediction"]
+    old_version = service.get_model_version("xgb_energia")
+    assert service.reload_models()["xgb_energia"] == "unchanged"
+
+    # Nuevo artefacto válido: se publica con otra versión
+    save_energy_model(tmp_path, offset=500.0)
+    bump_mtime(tmp_path / "xgb_energia.pkl", 1)
+    assert service.reload_models()["xgb_energia"] == "reloaded"
+    assert service.get_model_version("xgb_energia") != old_version
+    after = service.predict_resource_impact("tun", hora=12)["energy_prediction"]
+    assert after > before + 300
+
+    # Artefacto corrupto: se descarta y sigue sirviendo la versión anterior
+    (tmp_path / "xgb_energia.pkl").write_bytes(b"not a model")
+    bump_mtime(tmp_path / "xgb_energia.pkl", 2)
+    assert service.reload_models()["xgb_energia"] == "rejected"
+    assert service.predict_resource_impact("tun", hora=12)["energy_prediction"] == after
+
+def test_concurrent_swaps_publish_model_and_version_together(tmp_path):
+    import threading
+    service = PredictionService(models_path=str(tmp_path))
+
+    # Cargas bajo demanda y recargas de modelos distintos a la vez: ninguna pisa a otra
+    def publish(key):
+        for i in range(300):
+            service._swap_model(key, (key, i), f"{key}-{i}")
+
+    threads = [threading.Thread(target=publish, args=(f"m{n}",)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert service.model_versions == {f"m{n}": f"m{n}-299" for n in range(4)}
+    for key, (model, version) in service._loaded.items():
+        assert version == f"{model[0]}-{model[1]}"
+
+def test_pool_superset_is_cached_under_the_worker_version(tmp_path, monkeypatch):
+    import asyncio
+    import shutil
+    from datetime import datetime
+    from app.services import inference_executor as executor_module
+    from app.services.inference_executor import InferenceExecutor
+    from app.services.prediction_service import prediction_service
+
+    shutil.copy(os.path.join(prediction_service.models_path, "prophet_uptc_tun.pkl"), tmp_path)
+    artifact = tmp_path / "prophet_uptc_tun.pkl"
+    service = PredictionService(models_path=str(tmp_path))
+    executor = InferenceExecutor(max_workers=1, models_path=str(tmp_path))
+    monkeypatch.setattr(executor_module, "inference_executor", executor)
+    today = datetime.now().strftime("%Y%m%d")
+
+    def cached(version):
+        return f"prophet_tun@{version}:superset_{today}" in service._prediction_cache
+
+    async def scenario():
+        first = await service.apredict_campus_consumption("tun", days=7)
+        old_version = service.get_model_version("prophet_tun")
+        assert cached(old_version)
+
+        # El artefacto cambia en disco, pero el worker sigue con el modelo que cargó
+        bump_mtime(artifact, 1)
+        new_version = service.get_model_version("prophet_tun")
+        assert new_version != old_version
+        assert await service.apredict_campus_consumption("tun", days=7) == first
+        assert not cached(new_version)
+
+        # Al renovar el pool los workers cargan el archivo nuevo y su versión
+        assert await executor.reload()
+        await service.apredict_campus_consumption("tun", days=7)
+        assert cached(new_version)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
@@ -0,0 +1,56 @@
+import sys
+import os
+import logging
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import joblib
+import numpy as np
+import pandas as pd
+from prophet import Prophet
+
+from app.services.model_artifacts import compiled_path, load_artifact, resolve_artifact
+from app.services.model_training import merge_history, refit_all
+
+logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+
+def daily_series(start, periods, seed):
+    rng = np.random.default_rng(seed)
+    ds = pd.date_range(start, periods=periods, freq="D")
+    y = 500 + 120 * (ds.dayofweek < 5) + rng.normal(0, 10, len(ds))
+    return pd.DataFrame({"ds": ds, "y": y})
+
+def test_merge_history_appends_only_new_days():
+    history = daily_series("2024-01-01", 10, 1)
+    readings = pd.DataFrame({
+        "ds": ["2024-01-05", "2024-01-11", "2024-01-11", "2024-01-12"],
+        "y": [999.0, 100.0, 50.0, 300.0],
+    })
+    merged, new_days = merge_history(history, readings)
+    assert new_days == 2
+    assert len(merged) == 12
+    # Las lecturas del mismo día se suman; los días ya ajustados no se tocan
+    assert merged["y"].iloc[-2:].tolist() == [150.0, 300.0]
+    assert merged["y"].iloc[4] == history["y"].iloc[4]
+
+def test_refit_publishes_versioned_artifact(tmp_path):
+    model = Prophet(weekly_seasonality=True, yearly_seasonality=False)
+    model.fit(daily_series("2024-01-01", 300, 2))
+    joblib.dump(model, tmp_path / "prophet_uptc_tun.pkl")
+
+    readings = {"prophet_tun": daily_series("2024-10-27", 30, 3)}
+    results = refit_all(tmp_path, {"prophet_tun": "prophet_uptc_tun.pkl"}, readings, workers=0)
+    result = results["prophet_tun"]
+    assert result["status"] == "refit" and result["warm_start"]
+    assert result["new_days"] == 30 and result["history_days"] == 330
+
+    # El artefacto activo pasa a ser el .json nuevo, con una copia versionada
+    artifact = resolve_artifact(tmp_path, "prophet_uptc_tun.pkl")
+    assert artifact.name == "prophet_uptc_tun.json"
+    assert (tmp_path / "versions" / "prophet_uptc_tun" / f"{result['version']}.json").exists()
+    assert (compiled_path(tmp_path, "prophet_uptc_tun.pkl") / "meta.json").exists()
+    refit = load_artifact(artifact)
+    assert refit.history["ds"].max() == pd.Timestamp("2024-11-25")
+
+    # Sin días nuevos no se vuelve a ajustar
+    again = refit_all(tmp_path, {"prophet_tun": "prophet_uptc_tun.pkl"}, readings, workers=0)
+    assert again["prophet_tun"]["status"] == "unchanged"
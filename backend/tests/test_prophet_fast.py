@@ -0,0 +1,65 @@
+import sys
+import os
+import logging
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+from prophet import Prophet
+
+from app.services.model_artifacts import load_compiled_prophet, save_compiled_prophet, strip_prophet_for_inference
+from app.services.prophet_fast import check_accuracy, compile_prophet, fast_predict
+
+logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+
+def fit_small_prophet():
+    rng = np.random.default_rng(7)
+    ds = pd.date_range("2023-01-01", "2024-12-31", freq="D")
+    y = 500 + 120 * (ds.dayofweek < 5) + 30 * np.sin(np.arange(len(ds)) / 40) + rng.normal(0, 10, len(ds))
+    model = Prophet(yearly_seasonality=True, weekly_seasonality=True)
+    model.add_country_holidays("CO")
+    model.fit(pd.DataFrame({"ds": ds, "y": y}))
+    return model
+
+def test_fast_path_matches_prophet_predict():
+    model = fit_small_prophet()
+    compiled = compile_prophet(model)
+    assert compiled is not None
+
+    # Pasado, futuro y horas no exactas
+    ds = pd.date_range("2024-06-01 08:30", periods=400, freq="D").to_numpy()
+    accuracy = check_accuracy(model, compiled, ds)
+    assert accuracy["max_rel_error"] < 1e-6
+
+    result = fast_predict(compiled, ds)
+    assert np.all(result["yhat_lower"] <= result["yhat"])
+    assert np.all(result["yhat"] <= result["yhat_upper"])
+
+def test_fast_path_declines_dates_outside_holiday_table():
+    model = fit_small_prophet()
+    compiled = compile_prophet(model)
+    assert fast_predict(compiled, pd.date_range("3000-01-01", periods=3).to_numpy()) is None
+
+def test_compiled_params_roundtrip_with_mmap(tmp_path):
+    model = fit_small_prophet()
+    compiled = compile_prophet(model)
+    save_compiled_prophet(compiled, tmp_path / "prophet_uptc_tun.fast")
+    loaded = load_compiled_prophet(tmp_path / "prophet_uptc_tun.fast")
+
+    assert isinstance(loaded.holiday_table, np.memmap)
+    ds = pd.date_range("2025-01-01", periods=90, freq="D").to_numpy()
+    expected = fast_predict(compiled, ds)
+    actual = fast_predict(loaded, ds)
+    for key in expected:
+        np.testing.assert_allclose(actual[key], expected[key])
+
+def test_stripped_model_predicts_the_same():
+    model = fit_small_prophet()
+    future = pd.DataFrame({"ds": pd.date_range("2025-01-01", periods=60, freq="D")})
+    expected = model.predict(future)
+
+    strip_prophet_for_inference(model)
+    assert len(model.history) == 2 and model.stan_fit is None
+    actual = model.predict(future)
+    np.testing.assert_allclose(actual["yhat"], expected["yhat"])
+    np.testing.assert_allclose(actual["trend"], expected["trend"])
@@ -0,0 +1,41 @@
+import sys
+import os
+import base64
+import json
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from app.api import series_format
+from app.services.historical_data_service import HistoricalDataGenerator
+
+def test_negotiation_honours_q_values():
+    assert series_format.negotiate(None) == series_format.JSON
+    assert series_format.negotiate("application/json, text/plain, */*") == series_format.JSON
+    accept = f"{series_format.COLUMNAR_JSON};q=0.5, {series_format.COLUMNAR_F32}"
+    assert series_format.negotiate(accept) == series_format.COLUMNAR_F32
+    with pytest.raises(HTTPException) as error:
+        series_format.negotiate("text/html")
+    assert error.value.status_code == 406
+
+def test_columnar_payloads_roundtrip_and_shrink():
+    columns = HistoricalDataGenerator("tunja").generate_range_arrays(2018, 2025, daily=False, seed=1)
+    kwh = columns["consumption_kwh"]
+    start = columns["timestamp"][0]
+
+    rows = json.dumps([
+        {"timestamp": t, "consumption_kwh": round(v, 2)}
+        for t, v in zip(np.datetime_as_string(columns["timestamp"], unit="s").tolist(), kwh.tolist())
+    ]).encode()
+    columnar = series_format.series_response(series_format.COLUMNAR_JSON, start, 3600, {"kwh": kwh}).body
+    packed = series_format.series_response(series_format.COLUMNAR_F32, start, 3600, {"kwh": kwh}).body
+    assert len(columnar) * 2 < len(rows)
+    assert len(packed) * 4 < len(rows)
+
+    envelope = json.loads(packed)
+    assert envelope["length"] == len(kwh) and envelope["step_seconds"] == 3600
+    assert np.datetime64(envelope["start_epoch"], "s") == start
+    decoded = np.frombuffer(base64.b64decode(envelope["columns"]["kwh"]), dtype=envelope["dtype"])
+    np.testing.assert_allclose(decoded, kwh, rtol=1e-6)
@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from app.services.xgb_fast import check_accuracy, compile_booster, fast_predict
+
+def fit_small_booster(**params):
+    rng = np.random.default_rng(3)
+    X = pd.DataFrame({
+        "hora": rng.integers(0, 24, 800).astype(float),
+        "temp_promedio_c": rng.uniform(5, 30, 800),
+        "area_m2": rng.uniform(100, 60000, 800),
+    })
+    y = 50 + 4 * X["hora"] + 0.002 * X["area_m2"] - 1.5 * X["temp_promedio_c"] + rng.normal(0, 3, 800)
+    X.loc[::7, "temp_promedio_c"] = np.nan  # Ramas por defecto para valores faltantes
+    model = xgb.XGBRegressor(n_estimators=40, max_depth=5, **params)
+    model.fit(X, y)
+    return model, X
+
+def test_compiled_ensemble_matches_booster_predict():
+    model, X = fit_small_booster()
+    compiled = compile_booster(model)
+    assert compiled is not None
+    assert compiled.feature_names == list(X.columns)
+
+    accuracy = check_accuracy(model, compiled, X)
+    assert accuracy["max_rel_error"] < 1e-6
+
+    # Fila única, como en predict_resource_impact
+    single = X.iloc[[5]]
+    np.testing.assert_allclose(fast_predict(compiled, single.to_numpy()), model.predict(single), rtol=1e-6)
+
+def test_unsupported_objective_falls_back():
+    model, _ = fit_small_booster(objective="reg:gamma")
+    assert compile_booster(model) is None
+
+def test_booster_threads_default_to_one_with_inference_pool(monkeypatch):
+    from app.core.config import get_settings
+    from app.services.prediction_service import PredictionService
+
+    settings = get_settings()
+    monkeypatch.setattr(settings, "xgb_nthread", None)
+    monkeypatch.setattr(settings, "inference_workers", None)
+    assert PredictionService()._xgb_nthread == 1
+    monkeypatch.setattr(settings, "inference_workers", 0)
+    assert PredictionService()._xgb_nthread == max(1, (os.cpu_count() or 1) // 3)
+    monkeypatch.setattr(settings, "xgb_nthread", 2)
+    assert PredictionService()._xgb_nthread == 2